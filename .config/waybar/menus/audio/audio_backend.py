@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# encoding:utf8
+"""Sinks, sources and server defaults for audio_menu.py.
+
+query() asks pactl for JSON (`pactl -f json`, PulseAudio >= 16 and
+pipewire-pulse) and runs the server info, sink and source queries at the
+same time instead of four pactl calls one after the other. Older pactl
+builds without `-f` fall back to streaming `pactl list` text under
+LC_ALL=C through audio_parser. Both paths return the same device records.
+
+switch_device() changes the default sink/source, its port and moves the
+live streams onto it, with every pactl call in flight at once.
+"""
+import json
+import os
+import re
+import subprocess
+
+from audio_parser import parse
+
+PACTL_ENV = os.environ.copy()
+PACTL_ENV["LC_ALL"] = "C" # Force English keys for parsing
+
+
+def make_device(index, name, desc, vol, ports, active_port, monitor=False):
+    """ports: port name -> description, in pactl order."""
+    return {
+        "index": index,
+        "name": name,
+        "desc": desc or name,
+        "vol": vol,
+        "ports": ports,
+        "active_port": active_port,
+        "monitor": monitor
+    }
+
+
+def pactl_many(*queries, fmt=None):
+    """Run several pactl queries concurrently; stdout of each, in order."""
+    base = ["pactl", "-f", fmt] if fmt else ["pactl"]
+    procs = [subprocess.Popen(base + list(q), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, env=PACTL_ENV) for q in queries]
+    outputs = []
+    for proc in procs:
+        stdout, _ = proc.communicate()
+        if proc.returncode != 0:
+            raise RuntimeError(f"pactl {' '.join(proc.args[1:])} failed")
+        outputs.append(stdout)
+    return outputs
+
+
+def first_percent(volume):
+    """Percent of the first channel, as the text parser always did."""
+    for channel in (volume or {}).values():
+        match = re.match(r'(\d+)%', channel.get("value_percent", ""))
+        if match:
+            return int(match.group(1))
+    return 0
+
+
+def device_from_json(d):
+    ports = {p["name"]: p.get("description", p["name"]) for p in d.get("ports", [])}
+    monitor = d.get("monitor_of_sink", "n/a") not in ("n/a", None)
+    return make_device(d.get("index"), d.get("name", ""), d.get("description"), first_percent(d.get("volume")), ports, d.get("active_port"), monitor)
+
+
+# Model part -> pactl query
+QUERIES = {"server": ["info"], "sinks": ["list", "sinks"], "sources": ["list", "sources"]}
+PARTS = tuple(QUERIES)
+
+
+def query_json(parts=PARTS):
+    model = {}
+    outputs = pactl_many(*(QUERIES[p] for p in parts), fmt="json")
+    for part, output in zip(parts, outputs):
+        data = json.loads(output)
+        if part == "server":
+            model["default_sink"] = data.get("default_sink_name", "")
+            model["default_source"] = data.get("default_source_name", "")
+        else:
+            model[part] = [device_from_json(d) for d in data]
+    return model
+
+
+def device_from_text(d):
+    """make_device() from an audio_parser.Device."""
+    vol = next(iter(d.volume.values()), 0)
+    ports = {p.name: p.description for p in d.ports}
+    return make_device(d.index, d.name, d.description, vol, ports, d.active_port, d.monitor_of not in (None, "n/a"))
+
+
+def info_value(info, key):
+    for line in info.splitlines():
+        if line.startswith(key + ": "):
+            return line.split(": ", 1)[1].strip()
+    return ""
+
+
+def query_text(parts=PARTS):
+    """Same as query_json() from `pactl list` text, parsed as it streams in."""
+    procs = {p: subprocess.Popen(["pactl"] + QUERIES[p], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, env=PACTL_ENV)
+             for p in parts}
+    model = {}
+    for part, proc in procs.items():
+        if part == "server":
+            info = proc.communicate()[0]
+            model["default_sink"] = info_value(info, "Default Sink")
+            model["default_source"] = info_value(info, "Default Source")
+        else:
+            model[part] = [device_from_text(d) for d in parse(proc.stdout)]
+    for proc in procs.values():
+        if proc.wait() != 0:
+            raise RuntimeError(f"pactl {' '.join(proc.args[1:])} failed")
+    return model
+
+
+def query_model(parts=PARTS):
+    """Dict with the requested parts: sinks, sources and/or default_sink/default_source."""
+    try:
+        return query_json(parts)
+    except (OSError, RuntimeError, ValueError, KeyError, AttributeError):
+        pass
+    return query_text(parts)
+
+
+def unpack(model):
+    return model["sinks"], model["sources"], model["default_sink"], model["default_source"]
+
+
+def query():
+    """(sinks, sources, default_sink, default_source); empty if pactl is unusable."""
+    try:
+        return unpack(query_model())
+    except (OSError, RuntimeError):
+        return [], [], "", ""
+
+
+def pactl_start(commands):
+    return [subprocess.Popen(["pactl"] + list(c), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=PACTL_ENV) for c in commands]
+
+
+def pactl_wait(procs):
+    """Wait for every started pactl; how many failed."""
+    return sum(1 for p in procs if p.wait() != 0)
+
+
+def short_rows(output):
+    """`pactl list short ...` rows split on tabs: [id, owner, ...]."""
+    return [line.split("\t") for line in output.splitlines() if line.count("\t")]
+
+
+def switch_device(name, port=None, kind="sink"):
+    """Make `name` the default sink/source, select `port` and move every
+    playing sink-input (recording source-output) onto it.
+
+    Default, port and the stream listing go out together and the moves run
+    in parallel, so a call and music switch to headphones in one step.
+    Recordings of monitor sources (screen recorders) are left alone.
+    Returns how many pactl calls failed.
+    """
+    stream = "sink-input" if kind == "sink" else "source-output"
+    commands = [[f"set-default-{kind}", name]]
+    if port:
+        commands.append([f"set-{kind}-port", name, port])
+    try:
+        procs = pactl_start(commands)
+    except OSError:
+        return len(commands)
+
+    queries = [["list", "short", f"{stream}s"]]
+    if kind == "source":
+        queries.append(["list", "short", "sources"])
+    try:
+        outputs = pactl_many(*queries)
+    except (OSError, RuntimeError):
+        return pactl_wait(procs) + 1
+
+    monitors = set()
+    if kind == "source":
+        monitors = {r[0] for r in short_rows(outputs[1]) if r[1].endswith(".monitor")}
+    moves = [[f"move-{stream}", r[0], name] for r in short_rows(outputs[0]) if r[1] not in monitors]
+    procs += pactl_start(moves)
+    return pactl_wait(procs)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# encoding:utf8
+"""Benchmark of audio_parser over `pactl list` transcripts.
+
+    python3 audio_bench.py [sinks.txt ...]
+
+To record one: `LC_ALL=C pactl list sinks > sinks.txt` (or sources).
+Without files it uses synthetic pro-audio outputs of 10 to 2000 nodes,
+each with a full Properties block, to check that parse time per line
+stays flat as the output grows.
+"""
+import random
+import sys
+import time
+
+from audio_parser import parse
+
+
+def synthetic_node(rng, index, kind="Sink", n_props=40, n_ports=3):
+    name = f"alsa_{kind.lower()}.usb-Focusrite_{index}.pro-output-{index}"
+    lines = [
+        f"{kind} #{index}",
+        "\tState: SUSPENDED",
+        f"\tName: {name}",
+        f"\tDescription: Scarlett {index} Pro",
+        "\tDriver: PipeWire",
+        "\tSample Specification: s32le 8ch 48000Hz",
+        "\tChannel Map: aux0,aux1,aux2,aux3,aux4,aux5,aux6,aux7",
+        "\tOwner Module: 4294967295",
+        "\tMute: no",
+    ]
+    vol = rng.randint(0, 100)
+    raw = round(vol / 100 * 65536)
+    lines.append("\tVolume: " + ",   ".join(f"aux{c}: {raw} / {vol:>3}% / -12.00 dB" for c in range(8)))
+    lines.append("\t        balance 0.00")
+    lines.append("\tBase Volume: 65536 / 100% / 0.00 dB")
+    if kind == "Source":
+        lines.append("\tMonitor of Sink: n/a")
+    else:
+        lines.append(f"\tMonitor Source: {name}.monitor")
+    lines.append("\tLatency: 0 usec, configured 0 usec")
+    lines.append("\tFlags: HARDWARE HW_MUTE_CTRL HW_VOLUME_CTRL DECIBEL_VOLUME LATENCY")
+    lines.append("\tProperties:")
+    for p in range(n_props):
+        lines.append(f'\t\tapi.alsa.prop{p} = "{rng.randrange(1 << 30)}"')
+    lines.append("\tPorts:")
+    for p in range(n_ports):
+        state = rng.choice(("availability unknown", "available", "not available"))
+        lines.append(f"\t\tpro-port-{p}: Line {p} (type: Line, priority: {10000 - p}, availability group: Legacy {p}, {state})")
+    lines.append("\tActive Port: pro-port-0")
+    lines.append("\tFormats:")
+    lines.append("\t\tpcm")
+    lines.append("")
+    return lines
+
+
+def synthetic_output(n_nodes, seed=1):
+    rng = random.Random(seed)
+    lines = []
+    for i in range(n_nodes):
+        lines += synthetic_node(rng, i, rng.choice(("Sink", "Source")))
+    return lines
+
+
+def bench_parser(paths=()):
+    if paths:
+        transcripts = []
+        for path in paths:
+            with open(path, errors="replace") as f:
+                transcripts.append((path, f.read().splitlines(True)))
+    else:
+        transcripts = [(f"synthetic-{n}", synthetic_output(n)) for n in (10, 100, 500, 2000)]
+
+    print(f"{'transcript':>20} {'lines':>7} {'nodes':>6} {'us/line':>8}")
+    for label, lines in transcripts:
+        best = None
+        # Best of 3 to keep scheduler noise out
+        for _ in range(3):
+            started = time.perf_counter()
+            nodes = sum(1 for _ in parse(lines))
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{label[-20:]:>20} {len(lines):>7} {nodes:>6} {best / max(len(lines), 1) * 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    bench_parser(sys.argv[1:])
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# encoding:utf8
+"""Resident audio state for audio_menu.py, kept fresh by `pactl subscribe`.
+
+    python3 audio_cache.py      # standalone; menu_server.py runs it in a thread
+
+One `pactl subscribe` stream drives the model: a removed sink/source is
+dropped by index on the spot, new/changed ones mark only their part
+(sinks, sources or server defaults) dirty, and dirty parts are re-queried
+together after a short debounce. Card events dirty both device lists,
+since a profile change swaps ports. The model is served as JSON over a
+Unix socket; read_model() is the menu side and returns None when the cache
+is not running, so the menu falls back to querying pactl itself.
+"""
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from menu_common import RUNTIME_DIR, is_running, recv_all
+
+from audio_backend import PACTL_ENV, PARTS, query_model, unpack
+
+SOCKET_PATH = os.path.join(RUNTIME_DIR, "waybar-audio.sock")
+
+EVENT = re.compile(r"Event '(\w+)' on ([\w-]+) #(\d+)")
+# Facility -> model parts it invalidates
+FACILITY_PARTS = {
+    "sink": ("sinks",),
+    "source": ("sources",),
+    "server": ("server",),
+    "card": ("sinks", "sources"),
+}
+DEBOUNCE = 0.05
+# How long a reader waits for a pending refresh before taking the model as is
+SETTLE_TIMEOUT = 0.3
+# The client outwaits the settle wait, or a dirty model means a full pactl query
+READ_TIMEOUT = SETTLE_TIMEOUT + 0.2
+
+
+def read_model(path=SOCKET_PATH, timeout=READ_TIMEOUT):
+    """(sinks, sources, default_sink, default_source) from the cache, or None."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            model = json.loads(recv_all(sock))
+        return unpack(model) if model else None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+class AudioCache():
+    """In-memory model + subscribe reader + debounced refresher + socket server."""
+
+    def __init__(self, path=SOCKET_PATH, debounce=DEBOUNCE):
+        self.path = path
+        self.debounce = debounce
+        self.model = None
+        self.lock = threading.Lock()
+        self.dirty = set()
+        self.wake = threading.Event()
+        self.settled = threading.Event()
+
+    def invalidate(self, parts):
+        with self.lock:
+            self.dirty.update(parts)
+            self.settled.clear()
+        self.wake.set()
+
+    def apply(self, line):
+        """One `pactl subscribe` line into the model."""
+        match = EVENT.match(line)
+        if not match: return
+        kind, facility, index = match.groups()
+        parts = FACILITY_PARTS.get(facility)
+        if not parts: return
+        if kind == "remove" and facility in ("sink", "source"):
+            with self.lock:
+                if self.model:
+                    key = parts[0]
+                    self.model[key] = [d for d in self.model[key] if d["index"] != int(index)]
+            return
+        self.invalidate(parts)
+
+    def _refresher(self):
+        while True:
+            self.wake.wait()
+            # Let a burst of events (a card profile switch) land first
+            time.sleep(self.debounce)
+            with self.lock:
+                parts, self.dirty = self.dirty, set()
+                self.wake.clear()
+                # Nothing to patch yet: build the whole model
+                if parts and self.model is None:
+                    parts = set(PARTS)
+            if not parts: continue
+            try:
+                fresh = query_model(tuple(p for p in PARTS if p in parts))
+            except (OSError, RuntimeError):
+                # Server gone; the subscribe loop will ask for a full refresh
+                continue
+            with self.lock:
+                if self.model is None:
+                    self.model = fresh
+                else:
+                    self.model.update(fresh)
+                if not self.dirty:
+                    self.settled.set()
+
+    def _subscriber(self):
+        """Follow `pactl subscribe`; reconnect if the sound server restarts."""
+        while True:
+            try:
+                proc = subprocess.Popen(["pactl", "subscribe"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, env=PACTL_ENV)
+            except OSError:
+                return
+            # Subscribed first, then a full query: no change falls in between
+            self.invalidate(PARTS)
+            for line in proc.stdout:
+                self.apply(line)
+            proc.wait()
+            with self.lock:
+                self.model = None
+            time.sleep(1)
+
+    def _reply(self, conn):
+        with conn:
+            self.settled.wait(SETTLE_TIMEOUT)
+            with self.lock:
+                data = json.dumps(self.model)
+            try:
+                conn.sendall(data.encode())
+            except OSError:
+                pass
+
+    def serve(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        server.listen(4)
+
+        threading.Thread(target=self._refresher, daemon=True).start()
+        threading.Thread(target=self._subscriber, daemon=True).start()
+        while True:
+            conn, _ = server.accept()
+            threading.Thread(target=self._reply, args=(conn,), daemon=True).start()
+
+
+if __name__ == "__main__":
+    # A second instance would steal the socket of the running one
+    if is_running(SOCKET_PATH):
+        sys.exit(0)
+    AudioCache().serve()
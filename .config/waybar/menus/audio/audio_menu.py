@@ -2,11 +2,15 @@
 # encoding:utf8
 """Custom Audio management script with Rofi UI - Refined version."""
 import os
-import re
 import subprocess
 import sys
 from os.path import expanduser
 
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from menu_common import rofi_command
+
+from audio_backend import query, switch_device
+from audio_cache import read_model
 
 ROFI_THEME = expanduser("~/.config/waybar/menus/audio/pulseaudio.rasi")
 ENC = "utf-8"
@@ -18,13 +22,11 @@ GREEN = "#00ff00"
 URGENT = "#EB6F92"
 
 def dmenu_cmd(num_lines, prompt="Audio"):
-    MIN_LINES = 1
-    MAX_LINES = 10 
-    current_lines = max(MIN_LINES, min(num_lines, MAX_LINES))
-
-    return ["rofi", "-dmenu", "-p", prompt, "-theme", ROFI_THEME, "-i", "-markup-rows", "-l", str(current_lines)]
+    # -format i: rofi answers with the row index, not the markup
+    return rofi_command(ROFI_THEME, prompt, num_lines, base=["rofi", "-dmenu", "-i", "-format", "i"])
 
 def get_selection(options, prompt="Audio"):
+    """Index of the chosen row, or None."""
     if not options: return None
     
 
@@ -34,65 +36,14 @@ def get_selection(options, prompt="Audio"):
     try:
         process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, encoding=ENC)
         stdout, _ = process.communicate(input=inp)
-        return stdout.strip()
+        index = int(stdout.strip())
     except Exception: return None
-
-def parse_pactl_output(output):
-    """Parses pactl list output into a list of dictionaries with Port support."""
-    devices = []
-    current_device = {}
-    in_ports = False
-    
-    for line in output.splitlines():
-        line = line.strip()
-        if not line:
-            in_ports = False
-            if current_device and "id" in current_device:
-                devices.append(current_device)
-                current_device = {}
-            continue
-            
-        if line.startswith("Sink #") or line.startswith("Source #"):
-            if current_device and "id" in current_device:
-                devices.append(current_device)
-            current_device = {"id": line.split("#")[1], "ports": {}, "active_port": None}
-            in_ports = False
-            continue
-        
-        # Handle 'Ports:' block start (it ends with colon but no space usually)
-        if line == "Ports:":
-            in_ports = True
-            continue
-            
-        # Detect key-values with divider
-        if ": " in line:
-            key, value = line.split(": ", 1)
-            
-            if key == "Active Port":
-                in_ports = False
-                current_device["active_port"] = value
-                continue
-            
-            if in_ports:
-                # Format: port_name: description (priority...)
-                p_name = key
-                # Description often contains parenthesis with priority, type, etc.
-                p_desc = value.split(" (")[0]
-                current_device["ports"][p_name] = p_desc
-            else:
-                current_device[key] = value
-
-    if current_device and "id" in current_device:
-        devices.append(current_device)
-        
-    return devices
+    # Typed text that matches no row comes back as -1
+    return index if 0 <= index < len(options) else None
 
 def get_audio_info():
-    sinks = []
-    sources = []
-    
-    env = os.environ.copy()
-    env["LC_ALL"] = "C" # Force English keys for parsing
+    # Resident cache first (audio_cache.py), pactl if it is not running
+    raw_sinks, raw_sources, default_sink, default_source = read_model() or query()
     
     # helper to clean up long names
     def clean_device_name(desc):
@@ -118,21 +69,18 @@ def get_audio_info():
     def process_raw_devices(raw_list, default_name):
         processed = []
         for d in raw_list:
-            name = d.get("Name", "")
-            raw_desc = d.get("Description", name)
+            name = d["name"]
+            raw_desc = d["desc"]
             base_desc = clean_device_name(raw_desc)
             if not base_desc: base_desc = raw_desc # fallback if we stripped everything
             
-            # Extract volume percent
-            vol_str = d.get("Volume", "")
-            vol_match = re.search(r'(\d+)%', vol_str)
-            vol = int(vol_match.group(1)) if vol_match else 0
+            vol = d["vol"]
             
             is_default = (name == default_name)
             
             # Ports Logic
-            ports = d.get("ports", {})
-            active_port = d.get("active_port")
+            ports = d["ports"]
+            active_port = d["active_port"]
             
             # If we have multiple valid ports
             available_ports = []
@@ -180,29 +128,16 @@ def get_audio_info():
                 })
         return processed
 
-    # Get Sinks
-    try:
-        res = subprocess.run(["pactl", "list", "sinks"], capture_output=True, text=True, env=env).stdout
-        raw_sinks = parse_pactl_output(res)
-        default_sink = subprocess.run(["pactl", "get-default-sink"], capture_output=True, text=True, env=env).stdout.strip()
-        sinks = process_raw_devices(raw_sinks, default_sink)
-    except Exception: pass
-
-    # Get Sources
-    try:
-        res = subprocess.run(["pactl", "list", "sources"], capture_output=True, text=True, env=env).stdout
-        raw_sources = parse_pactl_output(res)
-        default_source = subprocess.run(["pactl", "get-default-source"], capture_output=True, text=True, env=env).stdout.strip()
-        
-        # Pre-filter monitors from raw list
-        filtered_sources = []
-        for s in raw_sources:
-             # Ignore monitors
-             if "monitor" not in s.get("Name", "") and "Monitor by" not in s.get("Description", ""):
-                 filtered_sources.append(s)
-                 
-        sources = process_raw_devices(filtered_sources, default_source)
-    except Exception: pass
+    sinks = process_raw_devices(raw_sinks, default_sink)
+    
+    # Pre-filter monitors from raw list
+    filtered_sources = []
+    for s in raw_sources:
+         # Ignore monitors
+         if not s["monitor"] and "monitor" not in s["name"] and "Monitor by" not in s["desc"]:
+             filtered_sources.append(s)
+             
+    sources = process_raw_devices(filtered_sources, default_source)
     
     return sinks, sources
 
@@ -241,91 +176,47 @@ def format_line(device, type="sink"):
         # Inactive: All Gray
         return f"<span foreground='{GRAY}'>{icon}  {name}</span>"
 
+def number_duplicates(devices):
+    """Two identical headsets get ' 1', ' 2' so the rows can be told apart."""
+    counts = {}
+    for d in devices:
+        counts[d["desc"]] = counts.get(d["desc"], 0) + 1
+    seen = {}
+    for d in devices:
+        if counts[d["desc"]] > 1:
+            seen[d["desc"]] = seen.get(d["desc"], 0) + 1
+            d["desc"] = f"{d['desc']} {seen[d['desc']]}"
+
+def apply_device(device, target_type):
+    # Default, port and live streams in one switch
+    switch_device(device["name"], device["port"], target_type)
+
 def main():
     sinks, sources = get_audio_info()
-    options = []
+    number_duplicates(sinks)
+    number_duplicates(sources)
+    # Row index -> (device, type); headers and spacer map to None
+    rows = []
     
     # Outputs Section
-    options.append("<b>SALIDAS:</b>")
+    rows.append(("<b>SALIDAS:</b>", None))
     for s in sinks:
-        options.append(format_line(s, "sink"))
+        rows.append((format_line(s, "sink"), (s, "sink")))
     
-    options.append("") # Spacer
+    rows.append(("", None)) # Spacer
     
     # Inputs Section
-    options.append("<b>ENTRADAS:</b>")
+    rows.append(("<b>ENTRADAS:</b>", None))
     for s in sources:
-        options.append(format_line(s, "source"))
+        rows.append((format_line(s, "source"), (s, "source")))
 
-    sel = get_selection(options)
+    index = get_selection([label for label, _ in rows])
     
     # Validation and Execution
-    if not sel or "<b>" in sel or sel.strip() == "":
+    if index is None or rows[index][1] is None:
         sys.exit(0)
     
-    # Parsing logic refined for Pango markup
-    # Format: <span ...>{icon}  {name} ({vol}%)</span>
-    
-    # 1. Strip all tags
-    text_only = re.sub(r'<[^>]+>', '', sel).strip()
-    
-    # 2. Remove Icon
-    parts = text_only.split(maxsplit=1)
-    if len(parts) > 1:
-        pure_name = parts[1]
-    else:
-        pure_name = text_only
-
-    # 3. Remove volume info like (50%) at end
-    pure_name = re.sub(r'\s*\(\d+%\)$', '', pure_name).strip()
-    
-    # Find the device with this desc
-    target_device = None
-    target_type = None
-    
-    # Helper to find match
-    for s in sinks:
-        if s["desc"] == pure_name:
-            target_device = s
-            target_type = "sink"
-            break
-            
-    if not target_device:
-        for s in sources:
-            if s["desc"] == pure_name:
-                target_device = s
-                target_type = "source"
-                break
-    
-    if target_device:
-        # Set Default Device
-        cmd_type = "set-default-sink" if target_type == "sink" else "set-default-source"
-        subprocess.run(["pactl", cmd_type, target_device["name"]])
-        
-        # Set Port if specific port is associated
-        if target_device["port"]:
-            port_cmd_type = "set-sink-port" if target_type == "sink" else "set-source-port"
-            subprocess.run(["pactl", port_cmd_type, target_device["name"], target_device["port"]])
-    
-    for s in sinks:
-        if s["desc"] == pure_name:
-            target_device = s
-            target_type = "sink"
-            break
-            
-    if not target_device:
-        for s in sources:
-            if s["desc"] == pure_name:
-                target_device = s
-                target_type = "source"
-                break
-    
-    if target_device:
-        cmd_type = "set-default-sink" if target_type == "sink" else "set-default-source"
-        subprocess.run(["pactl", cmd_type, target_device["name"]])
-        
-        # Optional: Notifications?
-        # subprocess.run(["notify-send", f"Audio {target_type} changed", target_device["desc"]])
+    apply_device(*rows[index][1])
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# encoding:utf8
+"""Streaming parser for `pactl list sinks|sources` text (LC_ALL=C).
+
+parse() takes any iterable of lines, a pactl stdout pipe included, and
+yields one Device as soon as the next header (or the end of input) closes
+it. Nesting is read from the tab indentation, not from blank lines, so
+Properties, Ports and Formats blocks never leak into the top-level fields.
+Patterns are compiled once at import.
+"""
+from collections import namedtuple
+import re
+
+Device = namedtuple("Device", "kind index name description volume mute properties ports active_port formats monitor_of fields")
+Port = namedtuple("Port", "name description priority available")
+
+HEADER = re.compile(r"(Sink|Source|Sink Input|Source Output|Card) #(\d+)$")
+CHANNEL = re.compile(r"([\w-]+): \d+ /\s*(\d+)%")
+PROPERTY = re.compile(r'([^=\s]+) = "(.*)"$')
+PORT = re.compile(r"([^:]+): (.*?)(?: \((?:type: [^,]*, )?priority: (\d+)([^)]*)\))?$")
+
+
+class DeviceBuilder():
+    """Fields of the block being read; build() freezes it into a Device."""
+
+    def __init__(self, kind, index):
+        self.kind = kind
+        self.index = int(index)
+        self.fields = {}
+        self.volume = {}
+        self.properties = {}
+        self.ports = []
+        self.formats = []
+
+    def field(self, key, value):
+        if key == "Volume":
+            self.volume = {ch: int(pct) for ch, pct in CHANNEL.findall(value)}
+        else:
+            self.fields[key] = value
+
+    def section_line(self, section, text):
+        if section == "Properties":
+            match = PROPERTY.match(text)
+            if match:
+                self.properties[match.group(1)] = match.group(2)
+        elif section == "Ports":
+            match = PORT.match(text)
+            if match:
+                name, desc, priority, details = match.groups()
+                available = None
+                if details and "not available" in details:
+                    available = False
+                elif details and details.endswith(" available"):
+                    available = True
+                self.ports.append(Port(name, desc, int(priority) if priority else 0, available))
+        elif section == "Formats":
+            self.formats.append(text)
+
+    def build(self):
+        f = self.fields
+        return Device(self.kind, self.index, f.get("Name", ""), f.get("Description"),
+                      self.volume, f.get("Mute") == "yes", self.properties, self.ports,
+                      f.get("Active Port"), self.formats, f.get("Monitor of Sink"), f)
+
+
+def parse(lines):
+    """Yield a Device per `Sink #N` / `Source #N` block of `lines`."""
+    builder = None
+    section = None
+    for line in lines:
+        text = line.strip()
+        if not text:
+            continue
+        depth = len(line) - len(line.lstrip("\t"))
+
+        if depth == 0:
+            if builder:
+                yield builder.build()
+            header = HEADER.match(text)
+            builder = DeviceBuilder(*header.groups()) if header else None
+            section = None
+            continue
+        if builder is None:
+            continue
+
+        if depth == 1:
+            key, sep, value = text.partition(": ")
+            if sep:
+                section = None
+                builder.field(key, value)
+            elif text.endswith(":"):
+                section = text[:-1]
+            # Anything else continues the previous value (Volume's "balance 0.00")
+        elif depth == 2 and section:
+            builder.section_line(section, text)
+        # Deeper lines (a port's profile list on cards) carry nothing we use
+
+    if builder:
+        yield builder.build()
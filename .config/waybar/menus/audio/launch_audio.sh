@@ -0,0 +1,3 @@
+#!/bin/bash
+python3 -S /home/sh1fter/.config/waybar/menus/menu_client.py audio ||
+    python3 /home/sh1fter/.config/waybar/menus/audio/audio_menu.py
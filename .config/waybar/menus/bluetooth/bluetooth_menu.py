@@ -1,26 +1,30 @@
 #!/usr/bin/env python3
 # encoding:utf8
 """Bluetooth Menu - Clonado de network_manager_custom.py"""
-import configparser
 import locale
 import os
 from os.path import expanduser
-import shlex
 from shutil import which
 import sys
-from time import sleep
 import subprocess
-import re
+import queue
+
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from menu_common import Action, ENC, ENV, Navigator, end_session, load_config, rofi_command, script_mode, select
+
+from bt_backend import get_backend, make_device
+from bt_cache import DeviceCache, Reconciler
+from bt_jobs import ConnectJob
+from bt_scan import make_scan, scan_options
 
 WHITE = "#FFFFFF"
 GRAY = "#7d7d7d"
 BLUE = "#00bfff"
 
-ENV = os.environ.copy()
-ENC = locale.getpreferredencoding()
+MIN_LINES = 1
+MAX_LINES = 10
 
-CONF = configparser.ConfigParser()
-CONF.read(expanduser("~/.config/networkmanager/config.ini"))
+CONF = load_config()
 
 try:
     LANG_CODE = locale.getlocale()[0]
@@ -40,7 +44,13 @@ TR = {
         'connected_suffix': "(Conectado)",
         'disconnecting': "Desconectando",
         'connecting': "Conectando a",
-        'forgotten': "Olvidado"
+        'forgotten': "Olvidado",
+        'pairing': "Emparejando con",
+        'trusting': "Confiando en",
+        'retrying': "Reintentando",
+        'connected': "Conectado a",
+        'disconnected': "Desconectado de",
+        'failed': "Falló"
     },
     'en': {
         'forget_device': "Forget Device",
@@ -52,319 +62,199 @@ TR = {
         'connected_suffix': "(Connected)",
         'disconnecting': "Disconnecting",
         'connecting': "Connecting to",
-        'forgotten': "Forgotten"
+        'forgotten': "Forgotten",
+        'pairing': "Pairing with",
+        'trusting': "Trusting",
+        'retrying': "Retrying",
+        'connected': "Connected to",
+        'disconnected': "Disconnected from",
+        'failed': "Failed"
     }
 }
 
 L = TR['es'] if str(LANG_CODE).lower().startswith('es') else TR['en']
 
+BACKEND = get_backend(
+    transport=CONF.get('bluetooth', 'scan_transport', fallback="auto"),
+    rssi=CONF.getint('bluetooth', 'scan_rssi', fallback=None)
+)
+CACHE = DeviceCache(
+    ttl=CONF.getfloat('bluetooth', 'cache_ttl_days', fallback=14) * 86400,
+    max_entries=CONF.getint('bluetooth', 'cache_size', fallback=256)
+).load()
+
+# Bucle de pantallas de esta corrida; guarda los dispositivos entre pantallas
+NAV = None
+
 def notify(message, urgency="low"):
     if which("notify-send"):
         subprocess.run(["notify-send", "-u", urgency, "-a", "bluetooth-menu", "-t", "3000", "-h", "string:x-canonical-private-synchronous:bluetooth_menu", message], check=False)
 
-def cli_args():
-    args = sys.argv[1:]
-    cmd = CONF.get('dmenu', 'dmenu_command', fallback=False)
-    if "-l" in args or "-p" in args:
-        for nope in ['-l', '-p'] if cmd is not False else ['-p']:
-            try:
-                nope_idx = args.index(nope)
-                del args[nope_idx]
-                del args[nope_idx]
-            except ValueError:
-                pass
-    return args
-
 def dmenu_cmd(num_lines, prompt="Bluetooth"):
-    MIN_LINES = 1
-    MAX_LINES = 10
-    current_lines = max(MIN_LINES, min(num_lines, MAX_LINES))
-
-    raw_cmd = CONF.get('dmenu', 'dmenu_command', fallback="rofi -dmenu")
-    command = shlex.split(raw_cmd)
-    
-    # Limpiar flags de líneas existentes en el comando base para evitar conflictos
-    if "-l" in command:
-        try:
-            idx = command.index("-l")
-            del command[idx:idx+2]
-        except: pass
-    if "-lines" in command:
-        try:
-            idx = command.index("-lines")
-            del command[idx:idx+2]
-        except: pass
-    
-    if "-dmenu" not in command:
-        command.append("-dmenu")
-    
-    if "-markup-rows" not in command:
-        command.append("-markup-rows")
-    
-    if "-p" in command:
-        idx = command.index("-p")
-        del command[idx:idx+2]
-        
-    command.extend(["-p", str(prompt)])
-    command.extend(["-l", str(current_lines)])
-    command.extend(cli_args())
-    
-
-    if "-theme" in command:
-        idx = command.index("-theme")
-        try:
-            command[idx+1] = expanduser("~/.config/waybar/menus/bluetooth/bluetooth.rasi")
-        except IndexError:
-            # Should not happen if -theme is the last arg without value, but just in case
-            command.extend([expanduser("~/.config/waybar/menus/bluetooth/bluetooth.rasi")])
-    else:
-        command.extend(["-theme", expanduser("~/.config/waybar/menus/bluetooth/bluetooth.rasi")])
-    
-    return command
-
-class Action():
-    def __init__(self, name, func, args=None, active=False):
-        self.name = name
-        self.func = func
-        self.is_active = active
-        self.args = args if isinstance(args, list) else ([args] if args else None)
-    def __str__(self):
-        return self.name
-    def __call__(self):
-        self.func(*self.args) if self.args else self.func()
+    return rofi_command(expanduser("~/.config/waybar/menus/bluetooth/bluetooth.rasi"), prompt, num_lines, MIN_LINES, MAX_LINES)
 
 def get_selection(actions):
-    inp = [str(a) for a in actions]
-    cmd = dmenu_cmd(len(inp))
-    sel = subprocess.run(cmd, capture_output=True, input="\n".join(inp), encoding=ENC, env=ENV).stdout.strip()
-    if not sel:
-        sys.exit(0)
-    for a in actions:
-        if str(a).strip() == sel.strip():
-            return a
-    sys.exit(0)
+    return select(actions, dmenu_cmd(len(actions)))
 
 def get_bt_devices():
     """Obtener dispositivos bluetooth paired."""
-    devices = []
-    seen = set()
-    
-    # Obtener dispositivos paired
-    result = subprocess.run(["bluetoothctl", "devices", "Paired"], capture_output=True, text=True)
-    for line in result.stdout.strip().splitlines():
-        parts = line.split(" ", 2)
-        if len(parts) >= 3 and parts[0] == "Device":
-            mac = parts[1]
-            name = parts[2]
-            seen.add(mac)
-            
-            info = subprocess.run(["bluetoothctl", "info", mac], capture_output=True, text=True).stdout
-            connected = "Connected: yes" in info
-            
-            devices.append({
-                "mac": mac,
-                "name": name,
-                "connected": connected,
-                "paired": True
-            })
-    
+    return BACKEND.get_devices(paired_only=True)
+
+def fetch_devices():
+    """Dispositivos reales; quedan en el cache para pintar al toque la proxima vez."""
+    devices = get_bt_devices()
+    CACHE.remember_paired(devices)
+    CACHE.save()
     return devices
 
-def scan_and_get_devices():
-    """Hacer scan bloqueante y obtener TODOS los dispositivos (paired + descubiertos)."""
-    devices = []
-    seen = set()
-    
-    # Primero agregar paired
-    result = subprocess.run(["bluetoothctl", "devices", "Paired"], capture_output=True, text=True)
-    for line in result.stdout.strip().splitlines():
-        parts = line.split(" ", 2)
-        if len(parts) >= 3 and parts[0] == "Device":
-            mac = parts[1]
-            name = parts[2]
-            seen.add(mac)
-            
-            info = subprocess.run(["bluetoothctl", "info", mac], capture_output=True, text=True).stdout
-            connected = "Connected: yes" in info
-            
-            devices.append({
-                "mac": mac,
-                "name": name,
-                "connected": connected,
-                "paired": True
-            })
-    
-    # Hacer scan y capturar dispositivos descubiertos
-    # Hacer scan y capturar dispositivos descubiertos
+def stream_selection(actions, scan):
+    """Mostrar el menú y agregar dispositivos a medida que `scan` los encuentra.
+
+    `scan` es un StreamingScan o un Reconciler: ambos publican dispositivos
+    nuevos en `updates` y exponen la tabla completa en `devices`.
+
+    rofi lee stdin de forma asíncrona, así que cada fila nueva aparece en
+    cuanto se escribe. El scan se detiene apenas el usuario elige algo.
+    """
+    # Filas en vivo: solo rofi -dmenu puede recibirlas
+    end_session()
+    cmd = dmenu_cmd(MAX_LINES)
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, encoding=ENC, env=ENV)
     try:
-        # Usar stdbuf para evitar buffering
-        cmd = ["stdbuf", "-oL", "bluetoothctl", "--timeout", "4", "scan", "on"]
-        
-        proc = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True
-        )
-        
-        try:
-            output, _ = proc.communicate(timeout=5)
-        except subprocess.TimeoutExpired:
-            proc.kill()
-            output, _ = proc.communicate()
-            
-        # Usar diccionario para permitir actualizaciones de nombre
-        # Clave: MAC, Valor: dict del dispositivo
-        scanned_devices = {}
-        
-        # Agregar dispositivos paired previos al tracking
-        for d in devices:
-            scanned_devices[d['mac']] = d
-        
-        # Regex para limpiar ANSI codes
-        def clean_ansi(text):
-            ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-            return ansi_escape.sub('', text)
-        
-        # Regex para capturar MAC de cualquier linea de dispositivo
-        import re
-        mac_pattern = re.compile(r"\[(?:NEW|CHG)\] Device ([0-9A-F:]{17})(?:\s+(.*))?", re.IGNORECASE)
-        
-        for line in output.splitlines():
-            line = clean_ansi(line) # Limpiar colores
-            match = mac_pattern.search(line)
-            if match:
-                mac = match.group(1).upper()
-                raw_rest = match.group(2).strip() if match.group(2) else ""
-                
-                # Detectar actualizaciones de nombre
-                possible_name = None
-                
-                # Casos comunes:
-                # [NEW] Device AA:BB... Name
-                # [CHG] Device AA:BB... Name: RealName
-                # [CHG] Device AA:BB... Alias: RealName
-                
-                if "Name:" in raw_rest:
-                    possible_name = raw_rest.split("Name:", 1)[1].strip()
-                elif "Alias:" in raw_rest:
-                    possible_name = raw_rest.split("Alias:", 1)[1].strip()
-                elif not any(x in raw_rest for x in ["RSSI:", "TxPower:", "ManufacturerData", "ServiceData", "Class:", "Icon:", "Connected:", "UUIDs:", "Modalias:"]):
-                    # Si no es ruido tecnico, asumimos que es el nombre (formato NEW)
-                    possible_name = raw_rest
-                
-                # Validar nombre
-                if possible_name:
-                    # Normalizar guiones a dos puntos para comparar con MAC
-                    norm_name = possible_name.replace("-", ":").upper()
-                    if norm_name == mac:
-                        possible_name = None # El nombre es solo la MAC disfrazada
-                
-                if mac not in scanned_devices:
-                    # Nuevo dispositivo
-                    
-                    # Intentar obtener info si no tenemos nombre o si el nombre es solo la MAC
-                    if not possible_name:
-                         info = subprocess.run(["bluetoothctl", "info", mac], capture_output=True, text=True).stdout
-                         for info_line in info.splitlines():
-                            if "Name:" in info_line:
-                                possible_name = info_line.split("Name:", 1)[1].strip()
-                                break
-                            if "Alias:" in info_line and not possible_name: # Fallback al alias
-                                 possible_name = info_line.split("Alias:", 1)[1].strip().replace("-", ":")
-                    
-                    name = possible_name if possible_name else mac
-                    
-                    # Estado (default desconectado para escaneados)
-                    connected = False
-                    paired = False
-                    
-                    scanned_devices[mac] = {
-                        "mac": mac,
-                        "name": name,
-                        "connected": connected,
-                        "paired": paired
-                    }
-                else:
-                    # Dispositivo ya conocido, actualizamos nombre si encontramos uno mejor
-                    if possible_name and possible_name != mac:
-                        current_name = scanned_devices[mac]['name']
-                        # Si el nombre actual es la MAC, o tenemos un nombre nuevo distinto
-                        if current_name == mac or (possible_name != current_name):
-                             scanned_devices[mac]['name'] = possible_name
-
-        # Convertir a lista y filtrar fantasmas (MACs sin nombre)
-        devices = []
-        for d in scanned_devices.values():
-             # Si esta emparejado o conectado, siempre mostrar
-             if d['paired'] or d['connected']:
-                 devices.append(d)
-                 continue
-             
-             # Si no esta emparejado, solo mostrar si tiene un nombre real
-             # (que no sea igual a la MAC normalizada)
-             d_name_norm = d['name'].replace("-", ":").upper()
-             if d_name_norm != d['mac']:
-                 devices.append(d)
-    
-    except Exception as e:
-        print(f"Scan error: {e}")
+        proc.stdin.write("\n".join(str(a) for a in actions) + "\n")
+        proc.stdin.flush()
+        while proc.poll() is None:
+            try:
+                dev = scan.updates.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            action = device_action(dev)
+            actions.append(action)
+            proc.stdin.write(f"{action}\n")
+            proc.stdin.flush()
+    except (BrokenPipeError, OSError):
         pass
-    
-    return devices
+    finally:
+        scan.stop()
+        CACHE.remember(scan.devices.values())
+        CACHE.save()
+
+    sel = proc.stdout.read().strip()
+    if not sel:
+        sys.exit(0)
+    for a in actions:
+        if str(a).strip() == sel:
+            return a
+    sys.exit(0)
 
 def toggle_connection(device):
-    """Conectar o desconectar un dispositivo."""
+    """Conectar o desconectar un dispositivo en un trabajo aparte.
+
+    El menú sale apenas lanza el trabajo; el progreso llega por notify().
+    """
     if device["connected"]:
-        notify(f"{L['disconnecting']} {device['name']}...")
-        subprocess.run(["bluetoothctl", "disconnect", device["mac"]], capture_output=True)
+        plan = "disconnect"
     else:
-        notify(f"{L['connecting']} {device['name']}...")
         # Si no está paired, primero emparejar
-        if not device.get("paired", False):
-            subprocess.run(["bluetoothctl", "pair", device["mac"]], capture_output=True, timeout=10)
-            subprocess.run(["bluetoothctl", "trust", device["mac"]], capture_output=True)
-        subprocess.run(["bluetoothctl", "connect", device["mac"]], capture_output=True)
+        plan = "connect" if device.get("paired", False) else "pair"
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--job", plan, device["mac"], device["name"]],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+
+def run_job(plan, mac, name):
+    """Cuerpo del trabajo lanzado por toggle_connection()."""
+    step_labels = {
+        "pair": L['pairing'],
+        "trust": L['trusting'],
+        "connect": L['connecting'],
+        "disconnect": L['disconnecting']
+    }
+
+    def progress(step, attempt, error):
+        if error is not None:
+            notify(f"{L['retrying']} {name} ({step}, {attempt})...")
+        elif attempt == 1:
+            notify(f"{step_labels[step]} {name}...")
+
+    job = ConnectJob(
+        BACKEND, mac, plan, progress,
+        retries=CONF.getint('bluetooth', 'connect_retries', fallback=3)
+    )
+    ok, step, error = job.run()
+    if ok:
+        # Que la proxima pantalla desde cache ya muestre el estado nuevo
+        CACHE.remember([make_device(mac, name, connected=plan != "disconnect", paired=True)])
+        CACHE.save()
+        notify(f"{L['disconnected'] if plan == 'disconnect' else L['connected']} {name}")
+    else:
+        notify(f"{L['failed']} {step_labels[step].lower()} {name}: {error}", "critical")
+    return ok
 
 def forget_device_menu():
     """Mostrar menú para olvidar dispositivos."""
-    devices = get_bt_devices()
+    devices = NAV.get("devices")
     
     if not devices:
         notify(L['no_saved_devices'])
-        main()
-        return
+        return home
     
-    inp = [d["name"] for d in devices]
-    cmd = dmenu_cmd(len(inp), prompt=L['olvidar_prompt'])
-    sel = subprocess.run(cmd, capture_output=True, input="\n".join(inp), encoding=ENC, env=ENV).stdout.strip()
-    
-    if not sel:
-        main()
-        return
-    
-    for d in devices:
-        if d["name"] == sel:
-            subprocess.run(["bluetoothctl", "remove", d["mac"]], capture_output=True)
-            notify(f"{L['forgotten']}: {sel}")
-            break
-    
-    main()
+    # Olvidar vuelve a la lista: la ventana compartida queda abierta
+    actions = [Action(d["name"], forget_device, d, keep_open=True) for d in devices]
+    selected = select(actions, dmenu_cmd(len(actions), prompt=L['olvidar_prompt']), exit_on_cancel=False)
+    if selected:
+        selected()
+    return home
+
+def forget_device(dev):
+    subprocess.run(["bluetoothctl", "remove", dev["mac"]], capture_output=True)
+    CACHE.forget(dev["mac"])
+    CACHE.save()
+    # Sacarlo de la lista ya leida en vez de volver a preguntar
+    NAV.put("devices", [d for d in NAV.get("devices") if d["mac"] != dev["mac"]])
+    notify(f"{L['forgotten']}: {dev['name']}")
 
 def refresh_and_show():
-    """Escanear (bloqueante) y mostrar menú con todos los dispositivos."""
+    """Escanear en streaming: el menú se abre ya y se llena a medida que llegan dispositivos."""
     notify(L['scanning'])
-    devices = scan_and_get_devices()
-    show_menu(devices)
+    NAV.invalidate("devices")
+    devices = list(NAV.get("devices"))
+    names = {mac: e["name"] for mac, e in CACHE.entries.items()}
+    scan = make_scan(BACKEND, devices, **scan_options(CONF, names))
+    return show_menu(devices, scan=scan.start())
 
 def main():
-    # Mostrar dispositivos paired inmediatamente
-    devices = get_bt_devices()
-    show_menu(devices)
+    global NAV
+    NAV = Navigator(devices=fetch_devices)
+    NAV.run(home)
 
-def show_menu(devices=None):
+def home():
+    if NAV.has("devices"):
+        # Volviendo de un submenu: la lista ya esta leida
+        return show_menu(list(NAV.get("devices")))
+    cached = CACHE.devices(paired_only=True)
+    # La ventana compartida del modo script no recibe filas en vivo: abre con el estado real
+    if not cached or script_mode(dmenu_cmd(len(cached))):
+        return show_menu(list(NAV.get("devices")))
+    # Pintar desde cache al toque y reconciliar con el adaptador en segundo plano
+    return show_menu(cached, scan=Reconciler(cached, lambda: NAV.get("devices")).start())
+
+def device_action(dev):
+    name = dev['name']
+    if dev["connected"]:
+        icon = "󰂱"  # Connected icon
+        # Active: Blue Icon + White Bold Text
+        label = f"<span foreground='{BLUE}'>{icon}</span>  <span foreground='{WHITE}' weight='bold'>{name}</span>"
+    else:
+        icon = "󰂯"  # Bluetooth icon
+        # Inactive: Gray
+        label = f"<span foreground='{GRAY}'>{icon}  {name}</span>"
+    return Action(label, toggle_connection, dev)
+
+def show_menu(devices=None, scan=None):
     if devices is None:
-        devices = get_bt_devices()
+        devices = list(NAV.get("devices"))
     
     # Ordenar: conectados primero, luego paired, luego otros
     devices.sort(key=lambda d: (not d["connected"], not d.get("paired", False), d["name"]))
@@ -372,31 +262,26 @@ def show_menu(devices=None):
     actions = []
     
     # Opciones fijas - White text
-    actions.append(Action(f"<span foreground='{WHITE}'>󰆴  {L['forget_device']}</span>", forget_device_menu))
+    actions.append(Action(f"<span foreground='{WHITE}'>󰆴  {L['forget_device']}</span>", forget_device_menu, keep_open=True))
     actions.append(Action(f"<span foreground='{WHITE}'>󰑐  {L['refresh_list']}</span>", refresh_and_show))
     actions.append(Action("               ", lambda: None))
     
     # Lista de dispositivos
     for dev in devices:
-        name = dev['name']
-        if dev["connected"]:
-            icon = "󰂱"  # Connected icon
-            # Active: Blue Icon + White Bold Text
-            label = f"<span foreground='{BLUE}'>{icon}</span>  <span foreground='{WHITE}' weight='bold'>{name}</span>"
-        else:
-            icon = "󰂯"  # Bluetooth icon
-            # Inactive: Gray
-            label = f"<span foreground='{GRAY}'>{icon}  {name}</span>"
-        
-        actions.append(Action(label, toggle_connection, dev))
+        actions.append(device_action(dev))
     
     # Si no hay dispositivos
     if not devices:
         actions.append(Action(f"<span foreground='{GRAY}'>󰂲  {L['searching']}</span>", lambda: None))
     
-    selected = get_selection(actions)
+    if scan is not None:
+        selected = stream_selection(actions, scan)
+    else:
+        selected = get_selection(actions)
     if selected:
-        selected()
+        return selected()
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["--job"] and len(sys.argv) >= 5:
+        sys.exit(0 if run_job(*sys.argv[2:5]) else 1)
     main()
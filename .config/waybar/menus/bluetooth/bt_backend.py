@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# encoding:utf8
+"""Backends de estado Bluetooth para bluetooth_menu.py.
+
+BluezBackend lee todos los org.bluez.Device1 con una sola llamada
+ObjectManager.GetManagedObjects. BluetoothctlBackend conserva el parseo de
+bluetoothctl como respaldo cuando no hay python-gobject o BlueZ no responde.
+DiscoverySession es el unico dueño del discovery del adaptador.
+"""
+import atexit
+import subprocess
+import threading
+
+try:
+    from gi.repository import Gio, GLib
+except ImportError:
+    Gio = None
+
+BLUEZ = "org.bluez"
+ADAPTER_IFACE = "org.bluez.Adapter1"
+DEVICE_IFACE = "org.bluez.Device1"
+OBJECT_MANAGER = "org.freedesktop.DBus.ObjectManager"
+PROPERTIES_IFACE = "org.freedesktop.DBus.Properties"
+DBUS_TIMEOUT_MS = 2000
+
+
+def make_device(mac, name=None, connected=False, paired=False, rssi=None, icon=None, path=None):
+    """Registro de dispositivo comun a todos los backends."""
+    return {
+        "mac": mac,
+        "name": name or mac,
+        "connected": connected,
+        "paired": paired,
+        "rssi": rssi,
+        "icon": icon,
+        "path": path
+    }
+
+
+class BluetoothctlBackend():
+    """Respaldo: parsea la salida de `bluetoothctl devices`."""
+    name = "bluetoothctl"
+
+    def _list(self, kind):
+        result = subprocess.run(["bluetoothctl", "devices", kind], capture_output=True, text=True)
+        found = []
+        for line in result.stdout.strip().splitlines():
+            parts = line.split(" ", 2)
+            if len(parts) >= 3 and parts[0] == "Device":
+                found.append((parts[1], parts[2]))
+        return found
+
+    def get_devices(self, paired_only=True):
+        # `devices Connected` reemplaza un `bluetoothctl info` por dispositivo
+        connected = {mac for mac, _ in self._list("Connected")}
+        devices = []
+        for mac, name in self._list("Paired"):
+            devices.append(make_device(mac, name, connected=mac in connected, paired=True))
+        return devices
+
+    def _ctl(self, timeout, ok_markers, *args):
+        try:
+            res = subprocess.run(["bluetoothctl", *args], capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            raise TimeoutError(f"bluetoothctl {args[0]}: timeout")
+        if not any(m in res.stdout for m in ok_markers):
+            raise RuntimeError(res.stdout.strip().splitlines()[-1] if res.stdout.strip() else f"bluetoothctl {args[0]} failed")
+
+    def pair(self, mac, timeout):
+        self._ctl(timeout, ("Pairing successful", "AlreadyExists"), "pair", mac)
+
+    def trust(self, mac, timeout):
+        self._ctl(timeout, ("trust succeeded",), "trust", mac)
+
+    def connect(self, mac, timeout):
+        self._ctl(timeout, ("Connection successful", "AlreadyConnected"), "connect", mac)
+
+    def disconnect(self, mac, timeout):
+        self._ctl(timeout, ("Successful disconnected", "Not connected"), "disconnect", mac)
+
+
+class DiscoverySession():
+    """Dueño unico del discovery del adaptador, con conteo de referencias.
+
+    El primer acquire() aplica SetDiscoveryFilter (transporte, umbral de
+    RSSI, DuplicateData apagado) y llama StartDiscovery; el ultimo release()
+    llama StopDiscovery. close() corre en atexit por si algun usuario no
+    libero su referencia; ademas BlueZ corta el discovery de un cliente
+    cuando su conexion D-Bus se cierra, asi que nunca queda la radio prendida.
+    """
+
+    def __init__(self, bus, adapter, transport="auto", rssi=None):
+        self.bus = bus
+        self.adapter = adapter
+        self.transport = transport
+        self.rssi = rssi
+        self.users = 0
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _call(self, method, params=None):
+        self.bus.call_sync(BLUEZ, self.adapter, ADAPTER_IFACE, method, params, None,
+                           Gio.DBusCallFlags.NONE, DBUS_TIMEOUT_MS, None)
+
+    def _filter(self):
+        filt = {
+            "Transport": GLib.Variant("s", self.transport),
+            "DuplicateData": GLib.Variant("b", False)
+        }
+        if self.rssi is not None:
+            filt["RSSI"] = GLib.Variant("n", self.rssi)
+        return GLib.Variant("(a{sv})", (filt,))
+
+    def acquire(self):
+        with self._lock:
+            if self.users == 0:
+                self._call("SetDiscoveryFilter", self._filter())
+                self._call("StartDiscovery")
+            self.users += 1
+
+    def release(self):
+        with self._lock:
+            if self.users == 0:
+                return
+            self.users -= 1
+            if self.users == 0:
+                self._stop()
+
+    def close(self):
+        with self._lock:
+            if self.users:
+                self.users = 0
+                self._stop()
+
+    def _stop(self):
+        try:
+            self._call("StopDiscovery")
+        except GLib.Error:
+            # Ya detenido (adaptador apagado, bluetoothd reiniciado)
+            pass
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class BluezBackend():
+    """Lee el arbol de objetos de BlueZ en un solo round trip D-Bus."""
+    name = "bluez"
+
+    def __init__(self, transport="auto", rssi=None):
+        self.bus = Gio.bus_get_sync(Gio.BusType.SYSTEM, None)
+        self.transport = transport
+        self.rssi = rssi
+        self._discovery = None
+        self._adapter = None
+
+    def adapter_path(self, objects=None):
+        if self._adapter and objects is None:
+            return self._adapter
+        objects = objects or self.managed_objects()
+        for path, ifaces in sorted(objects.items()):
+            if ADAPTER_IFACE in ifaces:
+                self._adapter = path
+                return path
+        return None
+
+    def device_path(self, mac):
+        return f"{self.adapter_path()}/dev_{mac.replace(':', '_')}"
+
+    def _device_call(self, mac, method, timeout, ok_errors=()):
+        try:
+            self.bus.call_sync(BLUEZ, self.device_path(mac), DEVICE_IFACE, method, None, None,
+                               Gio.DBusCallFlags.NONE, int(timeout * 1000), None)
+        except GLib.Error as e:
+            if Gio.DBusError.get_remote_error(e) in ok_errors:
+                return
+            raise
+
+    def pair(self, mac, timeout):
+        self._device_call(mac, "Pair", timeout, ("org.bluez.Error.AlreadyExists",))
+
+    def trust(self, mac, timeout):
+        self.bus.call_sync(
+            BLUEZ, self.device_path(mac), PROPERTIES_IFACE, "Set",
+            GLib.Variant("(ssv)", (DEVICE_IFACE, "Trusted", GLib.Variant("b", True))),
+            None, Gio.DBusCallFlags.NONE, int(timeout * 1000), None
+        )
+
+    def connect(self, mac, timeout):
+        self._device_call(mac, "Connect", timeout, ("org.bluez.Error.AlreadyConnected",))
+
+    def disconnect(self, mac, timeout):
+        self._device_call(mac, "Disconnect", timeout, ("org.bluez.Error.NotConnected",))
+
+    def discovery(self):
+        """La DiscoverySession del proceso (una por adaptador)."""
+        if self._discovery is None:
+            self._discovery = DiscoverySession(self.bus, self.adapter_path(), self.transport, self.rssi)
+        return self._discovery
+
+    def managed_objects(self):
+        res = self.bus.call_sync(
+            BLUEZ, "/", OBJECT_MANAGER, "GetManagedObjects", None,
+            GLib.VariantType.new("(a{oa{sa{sv}}})"),
+            Gio.DBusCallFlags.NONE, DBUS_TIMEOUT_MS, None
+        )
+        return res.unpack()[0]
+
+    def get_devices(self, paired_only=True):
+        try:
+            objects = self.managed_objects()
+        except GLib.Error:
+            # bluetoothd caido o sin permisos: mismo resultado por la via lenta
+            return BluetoothctlBackend().get_devices(paired_only)
+
+        devices = []
+        for path, ifaces in objects.items():
+            props = ifaces.get(DEVICE_IFACE)
+            if props is None:
+                continue
+            if paired_only and not props.get("Paired", False):
+                continue
+            devices.append(device_from_props(path, props))
+        return devices
+
+
+def device_from_props(path, props):
+    """Convierte las propiedades de org.bluez.Device1 en un registro."""
+    mac = props.get("Address", "").upper()
+    # Alias es lo que muestra bluetoothctl; si no hay nombre real BlueZ
+    # devuelve la MAC con guiones, que el menu trata como fantasma.
+    name = props.get("Alias") or props.get("Name") or mac
+    return make_device(
+        mac,
+        name,
+        connected=props.get("Connected", False),
+        paired=props.get("Paired", False),
+        rssi=props.get("RSSI"),
+        icon=props.get("Icon"),
+        path=path
+    )
+
+
+def get_backend(transport="auto", rssi=None):
+    """BlueZ por D-Bus si esta disponible, si no bluetoothctl."""
+    if Gio is not None:
+        try:
+            return BluezBackend(transport, rssi)
+        except Exception:
+            pass
+    return BluetoothctlBackend()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# encoding:utf8
+"""Cache en disco de dispositivos Bluetooth para bluetooth_menu.py.
+
+Guarda MAC -> nombre, ultimo RSSI, ultima vez visto y flags paired/connected
+en ~/.cache/bluetooth-menu/devices.json. El menu pinta desde aqui al toque y
+despues reconcilia con el estado real (stale-while-revalidate).
+"""
+import json
+from os.path import expanduser
+import queue
+import threading
+import time
+
+from menu_common import write_json
+
+from bt_backend import make_device
+from bt_scan import is_ghost
+
+CACHE_FILE = expanduser("~/.cache/bluetooth-menu/devices.json")
+
+
+class DeviceCache():
+    """MAC -> ultimo estado conocido, con expiracion por TTL y tope de tamaño."""
+
+    def __init__(self, path=CACHE_FILE, ttl=14 * 86400, max_entries=256):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = {}
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+        self.evict()
+        return self
+
+    def evict(self, now=None):
+        now = now or time.time()
+        self.entries = {mac: e for mac, e in self.entries.items() if now - e.get("last_seen", 0) < self.ttl}
+        if len(self.entries) > self.max_entries:
+            newest = sorted(self.entries.items(), key=lambda kv: kv[1].get("last_seen", 0), reverse=True)
+            self.entries = dict(newest[:self.max_entries])
+
+    def devices(self, paired_only=True):
+        found = []
+        for mac, e in self.entries.items():
+            if paired_only and not e.get("paired"):
+                continue
+            found.append(make_device(mac, e["name"], connected=e.get("connected", False), paired=e.get("paired", False), rssi=e.get("rssi")))
+        return found
+
+    def remember(self, devices, now=None):
+        now = now or time.time()
+        for d in devices:
+            if is_ghost(d):
+                continue
+            old = self.entries.get(d["mac"], {})
+            self.entries[d["mac"]] = {
+                "name": d["name"],
+                "rssi": d.get("rssi") if d.get("rssi") is not None else old.get("rssi"),
+                "last_seen": now,
+                "paired": d["paired"],
+                "connected": d["connected"]
+            }
+
+    def remember_paired(self, devices, now=None):
+        """Lista completa de emparejados: los que ya no estan dejan de estarlo."""
+        live = {d["mac"] for d in devices}
+        for mac, e in self.entries.items():
+            if e.get("paired") and mac not in live:
+                e["paired"] = e["connected"] = False
+        self.remember(devices, now)
+
+    def forget(self, mac):
+        self.entries.pop(mac, None)
+
+    def save(self):
+        self.evict()
+        write_json(self.path, self.entries)
+
+
+class Reconciler():
+    """Trae el estado real en segundo plano y corrige lo que se pinto desde cache.
+
+    Los dispositivos ya pintados se actualizan en el mismo dict (la accion
+    del menu usa el estado vivo al elegir); los que no estaban en cache se
+    publican en `updates` igual que StreamingScan.
+    """
+
+    def __init__(self, cached, fetch):
+        self.devices = {d["mac"]: d for d in cached}
+        self.updates = queue.Queue()
+        self.fetch = fetch
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        live = self.fetch()
+        live_macs = set()
+        for d in live:
+            live_macs.add(d["mac"])
+            if d["mac"] in self.devices:
+                self.devices[d["mac"]].update(d)
+            else:
+                self.devices[d["mac"]] = d
+                self.updates.put(d)
+        # Olvidados desde otro lado: ya no estan emparejados
+        for mac, d in self.devices.items():
+            if mac not in live_macs:
+                d["paired"] = d["connected"] = False
+
+    def stop(self, reason="selection"):
+        # Darle al estado real un momento para llegar antes de ejecutar la accion
+        if self._thread:
+            self._thread.join(timeout=1)
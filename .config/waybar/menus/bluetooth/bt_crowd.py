@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# encoding:utf8
+"""Modo multitud para el scan Bluetooth.
+
+En conferencias el scan ve cientos de anunciantes, casi todos con
+direcciones privadas rotativas. Con el modo multitud activo, CrowdFilter
+fusiona las rotaciones de un mismo dispositivo por su huella (nombre +
+bytes de fabricante/servicio), descarta lo que esta bajo el piso de RSSI
+y deja pasar al menu solo los K mas fuertes con heapq, sin ordenar la
+tabla completa.
+"""
+import heapq
+
+NO_RSSI = -127
+
+
+def is_rpa(mac):
+    """Direccion privada resoluble: los dos bits altos del primer octeto son 01."""
+    try:
+        return int(mac[:2], 16) >> 6 == 1
+    except ValueError:
+        return False
+
+
+def fingerprint(device):
+    """Huella estable entre rotaciones de direccion, o None si no hay datos."""
+    name = None if device["name"].replace("-", ":").upper() == device["mac"] else device["name"]
+    manufacturer = device.get("manufacturer")
+    service_data = device.get("service_data")
+    if (manufacturer is None or manufacturer[1] is None) and service_data is None:
+        # Sin bytes de anuncio no alcanza: ni el id de fabricante (todos los
+        # iPhone comparten 0x004c) ni el nombre (dos "Galaxy Buds2" en la sala)
+        return None
+    return (name, manufacturer, service_data, tuple(sorted(device.get("services") or ())))
+
+
+def signal(device):
+    rssi = device.get("rssi")
+    return NO_RSSI if rssi is None else rssi
+
+
+class CrowdFilter():
+    """Fusion de RPAs y seleccion top-K por señal para StreamingScan."""
+
+    def __init__(self, mode="auto", max_rows=30, rssi_floor=-85, crowded_at=60):
+        self.mode = mode
+        self.max_rows = max_rows
+        self.rssi_floor = rssi_floor
+        self.crowded_at = crowded_at
+        self.aliases = {}
+        self.fingerprints = {}
+        self.pending = {}
+        # Filas de scan ya escritas en el menu (las lleva StreamingScan)
+        self.published = 0
+
+    def engaged(self, table_size):
+        if self.mode == "on":
+            return True
+        if self.mode == "off":
+            return False
+        return table_size > self.crowded_at
+
+    def resolve(self, mac):
+        return self.aliases.get(mac, mac)
+
+    def merge(self, table, key, shown=()):
+        """Si `key` es la rotacion de un dispositivo ya visto, lo fusiona.
+
+        Devuelve la clave canonica con la que sigue la tabla. Una fila que ya
+        esta en el menu (`shown`) conserva su MAC: la accion de esa fila
+        conecta a la direccion con la que se mostro.
+        """
+        device = table[key]
+        if not is_rpa(device["mac"]):
+            return key
+        fp = fingerprint(device)
+        if fp is None:
+            return key
+        owner = self.fingerprints.setdefault(fp, key)
+        if owner == key or owner not in table:
+            self.fingerprints[fp] = key
+            return key
+
+        canonical = table[owner]
+        if owner not in shown:
+            # Todavia pendiente: la direccion nueva es la que sirve para conectar
+            canonical["mac"] = device["mac"]
+        if device.get("rssi") is not None:
+            canonical["rssi"] = device["rssi"]
+        self.aliases[key] = owner
+        del table[key]
+        self.pending.pop(key, None)
+        return owner
+
+    def offer(self, key, device):
+        self.pending[key] = device
+
+    def flush(self):
+        """Los mejores pendientes que caben en las filas que quedan."""
+        slots = self.max_rows - self.published
+        if slots <= 0 or not self.pending:
+            self.pending.clear()
+            return []
+        strong = [(k, d) for k, d in self.pending.items() if signal(d) >= self.rssi_floor]
+        picked = heapq.nlargest(slots, strong, key=lambda kd: signal(kd[1]))
+        for k, _ in picked:
+            del self.pending[k]
+        # Acotar lo que queda esperando para que cada tick cueste lo mismo
+        if len(self.pending) > 4 * self.max_rows:
+            self.pending = dict(heapq.nlargest(4 * self.max_rows, self.pending.items(), key=lambda kd: signal(kd[1])))
+        return picked
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# encoding:utf8
+"""Trabajos de conexion Bluetooth en segundo plano para bluetooth_menu.py.
+
+Un ConnectJob corre los pasos pair -> trust -> connect (o solo connect /
+disconnect) contra el backend, cada uno con su timeout y reintentos con
+backoff exponencial, avisando el progreso y registrando la latencia de
+cada intento en ~/.cache/bluetooth-menu/jobs.log.
+"""
+from os.path import expanduser
+import time
+
+from menu_common import append_log
+
+JOB_LOG = expanduser("~/.cache/bluetooth-menu/jobs.log")
+
+# Segundos por intento de cada paso
+STEP_TIMEOUTS = {
+    "pair": 20,
+    "trust": 3,
+    "connect": 12,
+    "disconnect": 5
+}
+
+PLANS = {
+    "pair": ["pair", "trust", "connect"],
+    "connect": ["connect"],
+    "disconnect": ["disconnect"]
+}
+
+
+class ConnectJob():
+    """Ejecuta un plan de PLANS para un dispositivo."""
+
+    def __init__(self, backend, mac, plan, progress, retries=3, backoff=1.0, log_path=JOB_LOG):
+        self.backend = backend
+        self.mac = mac
+        self.steps = PLANS[plan]
+        # progress(step, attempt, error): error es None al empezar un intento
+        self.progress = progress
+        self.retries = retries
+        self.backoff = backoff
+        self.log_path = log_path
+
+    def run(self):
+        """Devuelve (ok, paso_fallido, ultimo_error)."""
+        for step in self.steps:
+            error = self._run_step(step)
+            if error is not None:
+                return False, step, error
+        return True, None, None
+
+    def _run_step(self, step):
+        func = getattr(self.backend, step)
+        error = None
+        for attempt in range(1, self.retries + 1):
+            self.progress(step, attempt, None)
+            started = time.monotonic()
+            try:
+                func(self.mac, timeout=STEP_TIMEOUTS[step])
+                error = None
+            except Exception as e:
+                error = e
+            self._log(step, attempt, time.monotonic() - started, error)
+            if error is None:
+                return None
+            if attempt < self.retries:
+                self.progress(step, attempt, error)
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+        return error
+
+    def _log(self, step, attempt, elapsed, error):
+        status = "ok" if error is None else f"error={error}"
+        append_log(f"{self.mac} {step} attempt={attempt} {elapsed * 1000:.0f}ms {status}", self.log_path)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# encoding:utf8
+"""Parser incremental de la salida de `bluetoothctl scan on`.
+
+ScanParser se alimenta linea a linea y devuelve eventos tipados. Es una
+maquina de estados chica: ManufacturerData/ServiceData llegan como una
+linea `Key:` seguida de un volcado hexadecimal en varias lineas sin
+prefijo, que se junta hasta la siguiente linea normal. Todos los patrones
+se compilan una sola vez al importar.
+"""
+from collections import namedtuple
+import re
+
+NewDevice = namedtuple("NewDevice", "mac name")
+NameChange = namedtuple("NameChange", "mac name")
+RssiChange = namedtuple("RssiChange", "mac rssi")
+PropertyChange = namedtuple("PropertyChange", "mac key value")
+
+ANSI_ESCAPE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+DEVICE_LINE = re.compile(r"\[(NEW|CHG)\] Device ([0-9A-Fa-f:]{17})(?: (.*))?")
+PROPERTY = re.compile(r"(\w+)(?: (Key|Value))?:(?: (.*))?$")
+RSSI_VALUE = re.compile(r"(?:0x[0-9a-fA-F]+ \()?(-?\d+)")
+HEX_KEY = re.compile(r"0x([0-9a-fA-F]{4})")
+UUID = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+HEX_DUMP = re.compile(r"\s+((?:[0-9a-fA-F]{2} )+)")
+
+# Estados
+IDLE = 0
+VALUE = 1
+
+
+class ScanParser():
+    """Maquina de estados alimentada con feed(linea) -> [eventos]."""
+
+    def __init__(self):
+        self.state = IDLE
+        # Volcado en curso: (mac, propiedad, clave, bytes)
+        self.mac = None
+        self.key = None
+        self.data_key = None
+        self.data = []
+
+    def feed(self, line):
+        if "\x1b" in line:
+            line = ANSI_ESCAPE.sub('', line)
+
+        if self.state == VALUE:
+            dump = HEX_DUMP.match(line)
+            if dump:
+                self.data.append(dump.group(1))
+                return []
+            events = self._end_value()
+        else:
+            events = []
+
+        match = DEVICE_LINE.search(line)
+        if not match:
+            return events
+        tag, mac, rest = match.groups()
+        mac = mac.upper()
+        rest = rest.strip() if rest else ""
+
+        if tag == "NEW":
+            events.append(NewDevice(mac, real_name(mac, rest)))
+            return events
+
+        prop = PROPERTY.match(rest)
+        if not prop:
+            return events
+        key, part, value = prop.groups()
+        value = value or ""
+
+        if key in ("Name", "Alias"):
+            name = real_name(mac, value)
+            if name:
+                events.append(NameChange(mac, name))
+        elif key == "RSSI":
+            rssi = RSSI_VALUE.match(value)
+            if rssi:
+                events.append(RssiChange(mac, int(rssi.group(1))))
+        elif part == "Key":
+            self.mac, self.key, self.data = mac, key, []
+            hex_key = HEX_KEY.match(value)
+            uuid = UUID.search(value)
+            self.data_key = int(hex_key.group(1), 16) if hex_key else (uuid.group(0).lower() if uuid else value)
+            if key == "ServiceData":
+                events.append(PropertyChange(mac, "UUIDs", self.data_key))
+            elif key == "ManufacturerData":
+                # El id solo ya sirve; el volcado lo completa despues
+                events.append(PropertyChange(mac, key, (self.data_key, None)))
+        elif part == "Value":
+            if self.key == key and self.mac == mac:
+                self.state = VALUE
+        elif key == "UUIDs":
+            uuid = UUID.search(value)
+            events.append(PropertyChange(mac, "UUIDs", uuid.group(0).lower() if uuid else value))
+        else:
+            events.append(PropertyChange(mac, key, value))
+        return events
+
+    def _end_value(self):
+        self.state = IDLE
+        data = bytes.fromhex("".join(self.data))
+        return [PropertyChange(self.mac, self.key, (self.data_key, data))]
+
+    def close(self):
+        """Vacia un volcado pendiente al final de la transcripcion."""
+        return self._end_value() if self.state == VALUE else []
+
+
+def real_name(mac, name):
+    """None si el 'nombre' es la MAC disfrazada (AA-BB-...)."""
+    if not name or name.replace("-", ":").upper() == mac:
+        return None
+    return name
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# encoding:utf8
+"""Scan Bluetooth en streaming para bluetooth_menu.py.
+
+Lee las lineas [NEW]/[CHG] de `bluetoothctl scan on` a medida que llegan,
+mantiene una tabla de dispositivos por MAC y publica en una cola cada
+dispositivo que pasa a ser visible (con nombre real) para que el menu lo
+agregue sin esperar a que termine el scan. ScanController corta el
+discovery cuando la lista deja de cambiar y CrowdFilter acota la lista
+cuando hay demasiados anunciantes.
+"""
+from os.path import expanduser
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+from menu_common import append_log
+
+from bt_backend import BLUEZ, DEVICE_IFACE, OBJECT_MANAGER, PROPERTIES_IFACE, BluezBackend, make_device
+from bt_crowd import CrowdFilter
+from bt_parser import NameChange, NewDevice, PropertyChange, RssiChange, ScanParser
+
+SCAN_LOG = expanduser("~/.cache/bluetooth-menu/scans.log")
+
+
+def is_ghost(device):
+    """MAC sin nombre real y sin emparejar: no vale la pena mostrarla."""
+    if device["paired"] or device["connected"]:
+        return False
+    return device["name"].replace("-", ":").upper() == device["mac"]
+
+
+class ScanController():
+    """Termina el discovery cuando la tabla lleva `quiet` segundos estable.
+
+    Solo cuentan como cambio los dispositivos con nombre (nuevos o
+    renombrados); los fantasmas de solo MAC y los updates de RSSI no
+    reinician el periodo. `ceiling` es el tope duro.
+    """
+
+    def __init__(self, quiet=2.0, ceiling=10.0, clock=time.monotonic):
+        self.quiet = quiet
+        self.ceiling = ceiling
+        self.clock = clock
+        self.started = clock()
+        self.last_change = self.started
+        self.changes = 0
+        self.duration = None
+        self.reason = None
+
+    def note_change(self):
+        self.last_change = self.clock()
+        self.changes += 1
+
+    def should_stop(self):
+        now = self.clock()
+        if now - self.started >= self.ceiling:
+            return "ceiling"
+        if now - self.last_change >= self.quiet:
+            return "quiet"
+        return None
+
+    def finish(self, reason):
+        """Registra la duracion y el motivo; solo cuenta el primer motivo."""
+        if self.reason is None:
+            self.reason = reason
+            self.duration = self.clock() - self.started
+        return self.reason
+
+    def report(self):
+        return f"scan {self.duration:.2f}s reason={self.reason} named={self.changes} quiet={self.quiet} ceiling={self.ceiling}"
+
+
+def log_scan(controller, path=SCAN_LOG):
+    append_log(controller.report(), path)
+
+
+class StreamingScan():
+    """`bluetoothctl scan on` en segundo plano con tabla viva por MAC."""
+
+    def __init__(self, known=(), quiet=2.0, ceiling=10.0, names=None, crowd=None):
+        self.devices = {d["mac"]: d for d in known}
+        # Nombres ya vistos en scans anteriores (cache en disco)
+        self.names = names or {}
+        self.shown = {mac for mac, d in self.devices.items() if not is_ghost(d)}
+        self.updates = queue.Queue()
+        self.controller = ScanController(quiet, ceiling)
+        self.crowd = crowd or CrowdFilter()
+        self.known = len(self.devices)
+        self.proc = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        cmd = ["bluetoothctl", "scan", "on"]
+        try:
+            # stdbuf para que bluetoothctl no acumule la salida
+            self.proc = subprocess.Popen(["stdbuf", "-oL"] + cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        except FileNotFoundError:
+            self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        self._thread = threading.Thread(target=self._read, daemon=True)
+        self._thread.start()
+        threading.Thread(target=self._watch, daemon=True).start()
+        return self
+
+    def _watch(self):
+        while not self._stopped.is_set():
+            self.flush()
+            reason = self.controller.should_stop()
+            if reason:
+                self.stop(reason)
+                return
+            time.sleep(0.1)
+
+    def _read(self):
+        parser = ScanParser()
+        for line in self.proc.stdout:
+            for event in parser.feed(line):
+                self.handle(event)
+
+    def handle(self, event):
+        """Aplica un evento de ScanParser a la tabla."""
+        kind = type(event)
+        if kind is NewDevice or kind is NameChange:
+            self.publish(event.mac, event.name)
+        elif kind is RssiChange:
+            self.publish(event.mac, None, rssi=event.rssi)
+        elif kind is PropertyChange:
+            if event.key == "ManufacturerData":
+                company, data = event.value
+                self.publish(event.mac, None, manufacturer=(company, data[:8].hex() if data else None))
+            elif event.key == "ServiceData":
+                uuid, data = event.value
+                if data:
+                    self.publish(event.mac, None, service_data=(uuid, data[:8].hex()))
+            elif event.key == "UUIDs":
+                self.publish(event.mac, None, services=(event.value,))
+
+    def publish(self, mac, possible_name, **extra):
+        device = self.apply(mac, possible_name, **extra)
+        if device:
+            self.updates.put(device)
+
+    def apply(self, mac, possible_name, rssi=None, manufacturer=None, services=None, service_data=None):
+        """Actualiza la tabla; devuelve el dispositivo si recien se hizo visible.
+
+        En modo multitud las rotaciones de RPA se fusionan y los candidatos
+        quedan pendientes hasta el proximo flush(), que elige los K mas
+        fuertes.
+        """
+        with self._lock:
+            key = self.crowd.resolve(mac)
+            device = self.devices.get(key)
+            if device is None:
+                device = make_device(mac, possible_name or self.names.get(mac))
+                self.devices[key] = device
+            elif possible_name and possible_name != device["name"]:
+                device["name"] = possible_name
+                if key in self.shown:
+                    self.controller.note_change()
+            if rssi is not None:
+                device["rssi"] = rssi
+            if manufacturer is not None:
+                device["manufacturer"] = manufacturer
+            if services:
+                device["services"] = tuple(set(device.get("services", ())) | set(services))
+            if service_data is not None:
+                device["service_data"] = service_data
+
+            if key in self.shown or is_ghost(device):
+                return None
+            if not self.crowd.engaged(len(self.devices) - self.known):
+                return self._show(key, device)
+            key = self.crowd.merge(self.devices, key, self.shown)
+            if key not in self.shown:
+                self.crowd.offer(key, self.devices[key])
+            return None
+
+    def _show(self, key, device):
+        self.shown.add(key)
+        self.crowd.published += 1
+        self.controller.note_change()
+        return device
+
+    def flush(self):
+        """Publica los pendientes del modo multitud que entran en el top-K."""
+        with self._lock:
+            picked = [self._show(k, d) for k, d in self.crowd.flush()]
+        for device in picked:
+            self.updates.put(device)
+        return picked
+
+    def stop(self, reason="selection"):
+        with self._lock:
+            if self.controller.reason is not None:
+                return
+            self.controller.finish(reason)
+        self._stopped.set()
+        self._halt()
+        log_scan(self.controller)
+
+    def _halt(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+
+class BluezScan(StreamingScan):
+    """Misma tabla viva, pero alimentada por señales D-Bus de BlueZ.
+
+    El discovery lo maneja la DiscoverySession compartida del backend
+    (con filtro de transporte/RSSI y DuplicateData apagado), así que no
+    hay un segundo `bluetoothctl scan on` compitiendo por la radio.
+    """
+
+    def __init__(self, backend, known=(), quiet=2.0, ceiling=10.0, names=None, crowd=None):
+        super().__init__(known, quiet, ceiling, names, crowd)
+        self.backend = backend
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        threading.Thread(target=self._watch, daemon=True).start()
+        return self
+
+    def _loop(self):
+        from gi.repository import Gio, GLib
+
+        bus = self.backend.bus
+        ctx = GLib.MainContext.new()
+        ctx.push_thread_default()
+        # Despierta la iteracion de vez en cuando para revisar _stopped
+        tick = GLib.timeout_source_new(200)
+        tick.set_callback(lambda *a: True)
+        tick.attach(ctx)
+        subs = [
+            bus.signal_subscribe(BLUEZ, OBJECT_MANAGER, "InterfacesAdded", None, None,
+                                 Gio.DBusSignalFlags.NONE, self._on_added),
+            bus.signal_subscribe(BLUEZ, PROPERTIES_IFACE, "PropertiesChanged", None, DEVICE_IFACE,
+                                 Gio.DBusSignalFlags.NONE, self._on_changed),
+        ]
+        acquired = None
+        try:
+            session = self.backend.discovery()
+            session.acquire()
+            acquired = session
+            # Lo que BlueZ ya conoce de scans recientes entra de una
+            for path, ifaces in self.backend.managed_objects().items():
+                if DEVICE_IFACE in ifaces:
+                    self._from_props(ifaces[DEVICE_IFACE])
+            while not self._stopped.is_set():
+                ctx.iteration(True)
+        except Exception as e:
+            # Sin adaptador o BlueZ rechazo el filtro: el menu queda con lo pintado
+            print(f"Scan error: {e}", file=sys.stderr)
+        finally:
+            for sub in subs:
+                bus.signal_unsubscribe(sub)
+            # Solo si acquire() llego a tomarla
+            if acquired is not None:
+                acquired.release()
+            tick.destroy()
+            ctx.pop_thread_default()
+
+    def _from_props(self, props):
+        mac = props.get("Address", "").upper()
+        if mac:
+            self.publish(mac, props.get("Name"), **bluez_extra(props))
+
+    def _on_added(self, bus, sender, path, iface, signal, params):
+        _, ifaces = params.unpack()
+        if DEVICE_IFACE in ifaces:
+            self._from_props(ifaces[DEVICE_IFACE])
+
+    def _on_changed(self, bus, sender, path, iface, signal, params):
+        _, changed, _ = params.unpack()
+        if not changed.keys() & {"Name", "RSSI", "ManufacturerData", "ServiceData", "UUIDs"}:
+            return
+        # /org/bluez/hci0/dev_AA_BB_CC_DD_EE_FF
+        mac = path.rsplit("/", 1)[-1][4:].replace("_", ":")
+        self.publish(mac, changed.get("Name"), **bluez_extra(changed))
+
+    def _halt(self):
+        # Esperar a que el hilo libere la sesion (StopDiscovery) antes de salir
+        if self._thread:
+            self._thread.join(timeout=1)
+
+
+def bluez_extra(props):
+    """RSSI y datos de anuncio de org.bluez.Device1 para la fusion de RPAs."""
+    extra = {}
+    if "RSSI" in props:
+        extra["rssi"] = props["RSSI"]
+    manufacturer = props.get("ManufacturerData")
+    if manufacturer:
+        company = min(manufacturer)
+        extra["manufacturer"] = (company, bytes(manufacturer[company][:8]).hex())
+    service_data = props.get("ServiceData") or {}
+    services = set(props.get("UUIDs") or ()) | set(service_data)
+    if services:
+        extra["services"] = tuple(sorted(services))
+    if service_data:
+        uuid = min(service_data)
+        extra["service_data"] = (uuid, bytes(service_data[uuid][:8]).hex())
+    return extra
+
+
+def scan_options(conf, names=None):
+    """kwargs de make_scan() desde la seccion [bluetooth] de config.ini."""
+    return dict(
+        quiet=conf.getfloat('bluetooth', 'scan_quiet', fallback=2.0),
+        ceiling=conf.getfloat('bluetooth', 'scan_ceiling', fallback=10.0),
+        names=names,
+        crowd=CrowdFilter(
+            mode=conf.get('bluetooth', 'crowded', fallback="auto"),
+            max_rows=conf.getint('bluetooth', 'max_rows', fallback=30),
+            rssi_floor=conf.getint('bluetooth', 'rssi_floor', fallback=-85),
+            crowded_at=conf.getint('bluetooth', 'crowded_at', fallback=60)
+        )
+    )
+
+
+def make_scan(backend, known=(), **kwargs):
+    """BluezScan si el backend habla D-Bus, si no `bluetoothctl scan on`."""
+    if isinstance(backend, BluezBackend):
+        return BluezScan(backend, known, **kwargs)
+    return StreamingScan(known, **kwargs)
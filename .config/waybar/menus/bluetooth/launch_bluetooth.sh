@@ -1,13 +1,7 @@
 #!/bin/bash
 
-(
-  bluetoothctl scan on
-) &
-SCAN_PID=$!
-
-
-python3 /home/sh1fter/.config/waybar/menus/bluetooth/bluetooth_menu.py
-
-
-kill $SCAN_PID 2>/dev/null
-bluetoothctl scan off 2>/dev/null
+# El menu maneja su propia sesion de discovery (StartDiscovery/StopDiscovery
+# con filtro) y la cierra al salir; no lanzar otro `bluetoothctl scan on`.
+# Vive en menu_server.py; si no esta corriendo, arranque en frio.
+python3 -S /home/sh1fter/.config/waybar/menus/menu_client.py bluetooth ||
+    python3 /home/sh1fter/.config/waybar/menus/bluetooth/bluetooth_menu.py
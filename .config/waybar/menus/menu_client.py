@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""Ask menu_server.py to show a menu: `python3 -S menu_client.py wifi`.
+
+Imports nothing but os, socket and sys so the click stays cheap. Exits 1 when
+the server is not there, does not know the menu, or reports the open menu
+stuck, so the caller can fall back to running the menu script directly.
+"""
+import os
+import socket
+import sys
+
+SOCKET_PATH = os.path.join(os.environ.get("XDG_RUNTIME_DIR", f"/tmp/{os.getuid()}"), "waybar-menus.sock")
+
+
+def main():
+    if len(sys.argv) != 2:
+        print(__doc__)
+        return 1
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(1)
+            sock.connect(SOCKET_PATH)
+            sock.sendall(f"show {sys.argv[1]}".encode())
+            reply = sock.recv(16).decode()
+    except OSError:
+        return 1
+    # "busy": a menu is already open, a second rofi would not show anyway
+    return 0 if reply in ("ok", "busy") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
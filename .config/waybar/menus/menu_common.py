@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# encoding:utf8
+"""Pieces every waybar menu used to carry its own copy of.
+
+The menus add this directory to sys.path and import from here, so
+menu_server.py can host all of them in one process with a single
+config.ini read. It also holds the small socket and cache-file helpers
+the resident pieces share.
+
+With `rofi_mode = script` under [dmenu], select() keeps one rofi window
+open across screens (rofi_session.ScriptSession) instead of starting a
+rofi -dmenu per screen. An Action with keep_open=True leads to another
+select() screen, so the window stays up; any other choice closes it
+before the action runs. Code that starts its own rofi -dmenu calls
+end_session() first.
+"""
+import atexit
+import configparser
+import json
+import locale
+import os
+from os.path import expanduser
+import shlex
+import socket
+import subprocess
+import sys
+import time
+
+CONFIG_PATH = expanduser("~/.config/networkmanager/config.ini")
+ENV = os.environ.copy()
+ENC = locale.getpreferredencoding()
+RUNTIME_DIR = os.environ.get("XDG_RUNTIME_DIR", f"/tmp/{os.getuid()}")
+
+_CONF = None
+SESSION = None
+
+
+def load_config():
+    """config.ini, read once per process."""
+    global _CONF
+    if _CONF is None:
+        _CONF = configparser.ConfigParser()
+        _CONF.read(CONFIG_PATH)
+    return _CONF
+
+
+def is_running(path):
+    """Whether something is listening on the Unix socket `path`."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(path)
+        return True
+    except OSError:
+        return False
+
+
+def recv_all(sock, size=65536):
+    """Everything the peer sends on `sock` until it closes its side."""
+    chunks = []
+    while True:
+        chunk = sock.recv(size)
+        if not chunk: break
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def write_json(path, data):
+    """Replace `path` with `data` as JSON through a tmp file; errors are ignored."""
+    tmp = f"{path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def append_log(line, path):
+    """Timestamp `line`, echo it to stderr and append it to the log at `path`."""
+    line = f"{time.strftime('%Y-%m-%dT%H:%M:%S')} {line}"
+    print(line, file=sys.stderr)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a") as f:
+            f.write(line + "\n")
+    except OSError:
+        pass
+
+
+class Action():
+    def __init__(self, name, func, args=None, active=False, keep_open=False):
+        self.name = name
+        self.func = func
+        self.is_active = active
+        self.keep_open = keep_open
+        self.args = args if isinstance(args, list) else ([args] if args else None)
+    def __str__(self):
+        return self.name
+    def __call__(self):
+        # Whatever the action returns is the next screen (see Navigator)
+        return self.func(*self.args) if self.args else self.func()
+
+
+class Navigator():
+    """Runs a menu's screens in one loop instead of screens calling main().
+
+    A screen is a callable that returns the next screen, or None when the
+    menu is done. State several screens need is fetched once through the
+    named `fetchers` and kept until a screen invalidates it, so going to a
+    sub-menu and back does not rebuild everything and the stack does not
+    grow with the session.
+    """
+
+    def __init__(self, **fetchers):
+        self.fetchers = fetchers
+        self.state = {}
+
+    def get(self, key):
+        if key not in self.state:
+            self.state[key] = self.fetchers[key]()
+        return self.state[key]
+
+    def has(self, key):
+        return key in self.state
+
+    def put(self, key, value):
+        self.state[key] = value
+
+    def invalidate(self, *keys):
+        for key in keys:
+            self.state.pop(key, None)
+
+    def run(self, screen):
+        while screen is not None:
+            screen = screen()
+
+
+def cli_args(conf=None):
+    """Extra rofi args from our own argv, minus -p (and -l unless dmenu_command is set)."""
+    conf = conf or load_config()
+    args = sys.argv[1:]
+    cmd = conf.get('dmenu', 'dmenu_command', fallback=False)
+    if "-l" in args or "-p" in args:
+        for nope in ['-l', '-p'] if cmd is not False else ['-p']:
+            try:
+                nope_idx = args.index(nope)
+                del args[nope_idx]
+                del args[nope_idx]
+            except ValueError:
+                pass
+    return args
+
+
+def drop_flag(command, flag):
+    """Remove `flag` and its value from `command`."""
+    if flag in command:
+        idx = command.index(flag)
+        del command[idx:idx+2]
+
+
+def rofi_command(theme, prompt, num_lines=None, min_lines=1, max_lines=10, base=None):
+    """rofi -dmenu with markup rows, `prompt`, `theme` and clamped `-l`.
+
+    `base` defaults to [dmenu] dmenu_command from config.ini (plus our argv);
+    menus that never honoured that setting pass their fixed command.
+    """
+    if base is None:
+        command = shlex.split(load_config().get('dmenu', 'dmenu_command', fallback="rofi -dmenu"))
+        extra = cli_args()
+    else:
+        command = list(base)
+        extra = []
+
+    if num_lines is not None:
+        drop_flag(command, "-l")
+        drop_flag(command, "-lines")
+    if "-dmenu" not in command:
+        command.append("-dmenu")
+    if "-markup-rows" not in command:
+        command.append("-markup-rows")
+    drop_flag(command, "-p")
+
+    command.extend(["-p", str(prompt)])
+    if num_lines is not None:
+        command.extend(["-l", str(max(min_lines, min(num_lines, max_lines)))])
+    command.extend(extra)
+
+    if "-theme" in command:
+        idx = command.index("-theme")
+        if idx + 1 < len(command):
+            command[idx+1] = theme
+        else:
+            command.append(theme)
+    else:
+        command.extend(["-theme", theme])
+    return command
+
+
+def flag_value(command, flag):
+    if flag in command:
+        idx = command.index(flag)
+        if idx + 1 < len(command):
+            return command[idx+1]
+    return None
+
+
+def script_mode(cmd):
+    """Whether `cmd` can be served by the shared script-mode window."""
+    if load_config().get('dmenu', 'rofi_mode', fallback="dmenu") != "script":
+        return False
+    return os.path.basename(cmd[0]) == "rofi" and "-multi-select" not in cmd and "-password" not in cmd
+
+
+def end_session():
+    """Close the script-mode window, if one is open."""
+    global SESSION
+    if SESSION is not None:
+        SESSION.close()
+        SESSION = None
+
+atexit.register(end_session)
+
+
+def select_in_session(actions, cmd):
+    global SESSION
+    if SESSION is None or not SESSION.alive:
+        # Imported here: rofi_session itself builds on this module
+        from rofi_session import ScriptSession
+        end_session()
+        SESSION = ScriptSession(flag_value(cmd, "-theme"))
+    chosen = SESSION.select(actions, flag_value(cmd, "-p") or "")
+    if chosen is None or not chosen.keep_open:
+        end_session()
+    return chosen
+
+
+def select(actions, cmd, exit_on_cancel=True):
+    """Show `actions` with `cmd` and return the chosen one.
+
+    On cancel: exit, or return None when `exit_on_cancel` is False.
+    """
+    if script_mode(cmd):
+        chosen = select_in_session(actions, cmd)
+        if chosen is None and exit_on_cancel:
+            sys.exit(0)
+        return chosen
+
+    inp = [str(a) for a in actions]
+    sel = subprocess.run(cmd, capture_output=True, input="\n".join(inp), encoding=ENC, env=ENV).stdout.strip()
+    if sel:
+        for a in actions:
+            if str(a).strip() == sel.strip():
+                return a
+    if exit_on_cancel:
+        sys.exit(0)
+    return None
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# encoding:utf8
+"""One resident process for the wifi, bluetooth, audio and power menus.
+
+    python3 menu_server.py          # started at login (hyprland exec-once)
+    python3 -S menu_client.py wifi  # what waybar's on-click runs
+
+The menu modules are imported once at startup, together with their warm
+state: config.ini, libnm, the BlueZ backend and device cache, the logind
+backend, and the audio state cache, which runs in a thread here unless
+audio_cache.py is already running on its own. A click then costs the
+client round trip plus the rofi spawn. Only one menu is shown at a time;
+a request while one is open is answered "busy", or "stuck" once that menu
+has run for more than BUSY_LIMIT seconds, so the client falls back to a
+cold start instead of the menu silently never opening again. Config changes need a
+server restart, like they need a new process today.
+"""
+import importlib
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+
+import menu_common
+from menu_common import RUNTIME_DIR, is_running
+
+MENUS_DIR = os.path.dirname(os.path.abspath(__file__))
+SOCKET_PATH = os.path.join(RUNTIME_DIR, "waybar-menus.sock")
+# A menu open longer than this is taken as hung
+BUSY_LIMIT = 60
+
+# Request name -> (directory, module)
+MENUS = {
+    "wifi": ("wifi", "network_manager_custom"),
+    "bluetooth": ("bluetooth", "bluetooth_menu"),
+    "audio": ("audio", "audio_menu"),
+    "power": ("power", "power_menu"),
+}
+
+
+def load_menus():
+    """Import every menu; one that fails to import is left to the fallback."""
+    modules = {}
+    for name, (directory, module) in MENUS.items():
+        path = os.path.join(MENUS_DIR, directory)
+        if path not in sys.path:
+            sys.path.append(path)
+        try:
+            modules[name] = importlib.import_module(module)
+        except Exception:
+            traceback.print_exc()
+    return modules
+
+
+def warm_up(modules):
+    """Work the cold scripts pay on every click, done once here."""
+    wifi = modules.get("wifi")
+    if wifi:
+        try:
+            wifi.load_nm()
+            wifi.get_wifi_state()
+        except Exception:
+            traceback.print_exc()
+    if "audio" in modules:
+        import audio_cache
+        if not is_running(audio_cache.SOCKET_PATH):
+            threading.Thread(target=audio_cache.AudioCache().serve, daemon=True).start()
+
+
+class MenuServer():
+
+    def __init__(self, modules, path=SOCKET_PATH):
+        self.modules = modules
+        self.path = path
+        self.busy = threading.Lock()
+        self.started = None
+
+    def run_menu(self, name):
+        try:
+            self.modules[name].main()
+        except SystemExit:
+            # Cancel and "done" paths of the menus end in sys.exit()
+            pass
+        except Exception:
+            traceback.print_exc()
+        finally:
+            menu_common.end_session()
+            self.busy.release()
+
+    def handle(self, conn):
+        with conn:
+            try:
+                request = conn.recv(256).decode().split()
+            except OSError:
+                return
+            if len(request) != 2 or request[0] != "show" or request[1] not in self.modules:
+                reply = "unknown"
+            elif not self.busy.acquire(blocking=False):
+                reply = "busy" if time.monotonic() - self.started < BUSY_LIMIT else "stuck"
+            else:
+                self.started = time.monotonic()
+                threading.Thread(target=self.run_menu, args=(request[1],), daemon=True).start()
+                reply = "ok"
+            try:
+                conn.sendall(reply.encode())
+            except OSError:
+                pass
+
+    def serve(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        server.listen(4)
+        while True:
+            conn, _ = server.accept()
+            self.handle(conn)
+
+
+if __name__ == "__main__":
+    if is_running(SOCKET_PATH):
+        sys.exit(0)
+    sys.path.insert(0, MENUS_DIR)
+    modules = load_menus()
+    warm_up(modules)
+    MenuServer(modules).serve()
@@ -1,2 +1,3 @@
 #!/bin/bash
-python3 ~/.config/waybar/menus/power/power_menu.py
+python3 -S ~/.config/waybar/menus/menu_client.py power ||
+    python3 ~/.config/waybar/menus/power/power_menu.py
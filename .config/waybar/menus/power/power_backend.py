@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# encoding:utf8
+"""Backends de energia para power_menu.py.
+
+LogindBackend habla directo con org.freedesktop.login1.Manager: consulta
+CanSuspend/CanHibernate/CanReboot/CanPowerOff en paralelo y cada accion es
+una sola llamada D-Bus. SystemctlBackend es el respaldo sin python-gobject.
+Las capacidades se guardan unos segundos en disco para que abrir el menu
+seguido no vuelva a preguntar. lock_and_suspend() pide a logind que
+bloquee la sesion y suspenda; el bloqueo antes de dormir lo hace hypridle
+(before_sleep_cmd) bajo su propio inhibidor.
+"""
+import json
+import os
+from os.path import expanduser
+import socket
+import subprocess
+import sys
+import time
+
+from menu_common import write_json
+
+try:
+    from gi.repository import Gio, GLib
+except ImportError:
+    Gio = None
+
+LOGIND = "org.freedesktop.login1"
+LOGIND_PATH = "/org/freedesktop/login1"
+MANAGER_IFACE = "org.freedesktop.login1.Manager"
+SESSION_IFACE = "org.freedesktop.login1.Session"
+SESSION_PATH = "/org/freedesktop/login1/session/auto"
+DBUS_TIMEOUT_MS = 2000
+# G_MAXINT = sin timeout: la clave de polkit tarda lo que tarde el usuario
+NO_TIMEOUT_MS = 0x7fffffff
+# Errores de D-Bus que dicen que logind no esta, no que rechazo la accion
+UNREACHABLE = ("SERVICE_UNKNOWN", "NAME_HAS_NO_OWNER", "NO_SERVER", "DISCONNECTED", "SPAWN_SERVICE_NOT_FOUND")
+
+# Accion -> (metodo Can*, metodo que la ejecuta, verbo de systemctl)
+ACTIONS = {
+    'suspend': ("CanSuspend", "Suspend", "suspend"),
+    'hibernate': ("CanHibernate", "Hibernate", "hibernate"),
+    'reboot': ("CanReboot", "Reboot", "reboot"),
+    'shutdown': ("CanPowerOff", "PowerOff", "poweroff"),
+}
+# "challenge" = polkit va a pedir clave, igual se puede
+ALLOWED = ("yes", "challenge")
+
+LOCKER = ["hyprlock"]
+
+CAPS_CACHE = expanduser("~/.cache/power-menu/caps.json")
+CAPS_TTL = 30
+
+
+class Unavailable(Exception):
+    """logind no contesta; la accion puede repetirse con systemctl."""
+
+
+def unreachable(error):
+    dbus = Gio.dbus_error_quark()
+    if any(error.matches(dbus, getattr(Gio.DBusError, code)) for code in UNREACHABLE):
+        return True
+    return error.matches(Gio.io_error_quark(), Gio.IOErrorEnum.CLOSED)
+
+
+class SystemctlBackend():
+    """Respaldo: `systemctl <verbo>`, sin saber de antemano que se puede."""
+    name = "systemctl"
+
+    def capabilities(self):
+        return {action: True for action in ACTIONS}
+
+    def do(self, action):
+        subprocess.run(["systemctl", ACTIONS[action][2]], check=False)
+
+    def lock_session(self):
+        subprocess.run(["loginctl", "lock-session"], check=False)
+
+
+class LogindBackend():
+    name = "logind"
+
+    def __init__(self):
+        self.bus = Gio.bus_get_sync(Gio.BusType.SYSTEM, None)
+
+    def capabilities(self):
+        """Todas las Can* en vuelo a la vez sobre un contexto propio."""
+        context = GLib.MainContext.new()
+        context.push_thread_default()
+        results = {}
+        try:
+            for action, (can, _, _) in ACTIONS.items():
+                def done(bus, res, _data, action=action):
+                    try:
+                        results[action] = bus.call_finish(res).unpack()[0] in ALLOWED
+                    except GLib.Error:
+                        results[action] = False
+                self.bus.call(LOGIND, LOGIND_PATH, MANAGER_IFACE, can, None,
+                              GLib.VariantType.new("(s)"), Gio.DBusCallFlags.NONE,
+                              DBUS_TIMEOUT_MS, None, done, None)
+            while len(results) < len(ACTIONS):
+                context.iteration(True)
+        finally:
+            context.pop_thread_default()
+        return results
+
+    def do(self, action):
+        """Pide la accion a logind.
+
+        Si polkit la rechaza o el usuario cancela la clave no se repite por
+        systemctl (seria una segunda clave); solo se levanta Unavailable
+        cuando logind no esta.
+        """
+        method = ACTIONS[action][1]
+        try:
+            # interactive=True: polkit puede pedir clave si hace falta
+            self.bus.call_sync(LOGIND, LOGIND_PATH, MANAGER_IFACE, method,
+                               GLib.Variant("(b)", (True,)), None, Gio.DBusCallFlags.NONE,
+                               NO_TIMEOUT_MS, None)
+        except GLib.Error as e:
+            if unreachable(e):
+                raise Unavailable(e.message) from e
+            print(f"logind {method}: {e.message}", file=sys.stderr)
+
+    def lock_session(self):
+        """Lo mismo que `loginctl lock-session`: hypridle corre lock_cmd."""
+        try:
+            self.bus.call_sync(LOGIND, SESSION_PATH, SESSION_IFACE, "Lock", None, None,
+                               Gio.DBusCallFlags.NONE, DBUS_TIMEOUT_MS, None)
+        except GLib.Error as e:
+            if unreachable(e):
+                raise Unavailable(e.message) from e
+            print(f"logind Lock: {e.message}", file=sys.stderr)
+
+
+def get_backend():
+    """logind por D-Bus si esta disponible, si no systemctl."""
+    if Gio is not None:
+        try:
+            return LogindBackend()
+        except Exception:
+            pass
+    return SystemctlBackend()
+
+
+def capabilities(backend, path=CAPS_CACHE, ttl=CAPS_TTL):
+    """Capacidades desde el cache si tiene menos de `ttl` segundos."""
+    try:
+        if time.time() - os.path.getmtime(path) < ttl:
+            with open(path) as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        pass
+    try:
+        caps = backend.capabilities()
+    except Exception:
+        return SystemctlBackend().capabilities()
+    write_json(path, caps)
+    return caps
+
+
+def hyprland_dispatch(*args):
+    """`hyprctl dispatch ...` por el socket de Hyprland, sin lanzar hyprctl."""
+    signature = os.environ.get("HYPRLAND_INSTANCE_SIGNATURE")
+    runtime = os.environ.get("XDG_RUNTIME_DIR", "")
+    if signature:
+        for base in (os.path.join(runtime, "hypr"), "/tmp/hypr"):
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                    sock.settimeout(1)
+                    sock.connect(os.path.join(base, signature, ".socket.sock"))
+                    sock.sendall(" ".join(("dispatch",) + args).encode())
+                    return sock.recv(64) == b"ok"
+            except OSError:
+                continue
+    return subprocess.run(["hyprctl", "dispatch", *args], check=False).returncode == 0
+
+
+def locker_running():
+    return subprocess.run(["pidof", LOCKER[0]], capture_output=True).returncode == 0
+
+
+def start_locker():
+    """Lanza el bloqueador sin esperarlo (o no hace nada si ya esta)."""
+    if locker_running():
+        return None
+    return subprocess.Popen(LOCKER, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+
+
+def lock_and_suspend(backend):
+    """Bloquear y suspender en un paso: Lock de la sesion y Suspend.
+
+    No hace falta esperar al bloqueador: hypridle tiene
+    before_sleep_cmd = loginctl lock-session y toma su propio inhibidor
+    delay, asi que logind no duerme hasta que hyprlock esta arriba.
+    """
+    try:
+        backend.lock_session()
+        backend.do("suspend")
+    except Unavailable:
+        fallback = SystemctlBackend()
+        fallback.lock_session()
+        fallback.do("suspend")
@@ -7,6 +7,10 @@ from os.path import expanduser
 import subprocess
 import sys
 
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from menu_common import Action, rofi_command
+
+from power_backend import SystemctlBackend, Unavailable, capabilities, get_backend, hyprland_dispatch, lock_and_suspend, start_locker
 
 ROFI_THEME = expanduser("~/.config/waybar/menus/power/logout.rasi")
 ENC = "utf-8"
@@ -31,6 +35,7 @@ TR = {
         'lock': 'Bloquear',
         'logout': 'Cerrar sesión',
         'suspend': 'Suspender',
+        'lock_suspend': 'Bloquear y suspender',
         'reboot': 'Reiniciar',
         'shutdown': 'Apagar',
         'hibernate': 'Hibernar',
@@ -45,6 +50,7 @@ TR = {
         'lock': 'Lock',
         'logout': 'Logout',
         'suspend': 'Suspend',
+        'lock_suspend': 'Lock & suspend',
         'reboot': 'Reboot',
         'shutdown': 'Shutdown',
         'hibernate': 'Hibernate',
@@ -60,19 +66,10 @@ TR = {
 
 L = TR['es'] if str(LANG_CODE).lower().startswith('es') else TR['en']
 
+BACKEND = get_backend()
+
 def dmenu_cmd(num_lines, prompt="Power"):
-    MIN_LINES = 1
-    MAX_LINES = 10
-    current_lines = max(MIN_LINES, min(num_lines, MAX_LINES))
-    
-    return [
-        "rofi", "-dmenu", 
-        "-p", prompt, 
-        "-theme", ROFI_THEME, 
-        "-i", 
-        "-markup-rows", 
-        "-l", str(current_lines)
-    ]
+    return rofi_command(ROFI_THEME, prompt, num_lines, base=["rofi", "-dmenu", "-i"])
 
 def get_selection(options, prompt="Power"):
 
@@ -107,47 +104,48 @@ def confirm_action(message):
     text_only = re.sub(r'<[^>]+>', '', sel).strip()
     return text_only == L['yes']
 
-class Action():
-
-    def __init__(self, name, func, args=None, active=False):
-        self.name = name
-        self.func = func
-        self.is_active = active
-        self.args = args if isinstance(args, list) else ([args] if args else None)
-    def __str__(self):
-        return self.name
-    def __call__(self):
-        self.func(*self.args) if self.args else self.func()
+def power_action(action):
+    """Una llamada a logind; systemctl solo si logind no esta."""
+    try:
+        BACKEND.do(action)
+    except Unavailable:
+        SystemctlBackend().do(action)
 
 def lock_screen():
 
-    subprocess.run(["hyprlock"], check=False)
+    start_locker()
 
 def logout_session():
 
     if confirm_action(L['confirm_logout']):
-        subprocess.run(["hyprctl", "dispatch", "exit"], check=False)
+        hyprland_dispatch("exit")
 
 def suspend_system():
 
-    subprocess.run(["systemctl", "suspend"], check=False)
+    power_action("suspend")
+
+def lock_and_suspend_system():
+
+    lock_and_suspend(BACKEND)
 
 def reboot_system():
 
     if confirm_action(L['confirm_reboot']):
-        subprocess.run(["systemctl", "reboot"], check=False)
+        power_action("reboot")
 
 def shutdown_system():
 
     if confirm_action(L['confirm_shutdown']):
-        subprocess.run(["systemctl", "poweroff"], check=False)
+        power_action("shutdown")
 
 def hibernate_system():
 
-    subprocess.run(["systemctl", "hibernate"], check=False)
+    power_action("hibernate")
 
 def main():
 
+    # Solo lo que logind dice que va a funcionar
+    caps = capabilities(BACKEND)
     actions = []
     
 
@@ -163,28 +161,36 @@ def main():
     ))
     
 
-    actions.append(Action(
-        f"<span foreground='#aa00ff'>󰖔</span>  <span foreground='#FFFFFF'>{L['suspend']}</span>",
-        suspend_system
-    ))
+    if caps.get('suspend', True):
+        actions.append(Action(
+            f"<span foreground='#aa00ff'>󰖔</span>  <span foreground='#FFFFFF'>{L['suspend']}</span>",
+            suspend_system
+        ))
+        actions.append(Action(
+            f"<span foreground='#aa00ff'>󰌾</span>  <span foreground='#FFFFFF'>{L['lock_suspend']}</span>",
+            lock_and_suspend_system
+        ))
     
 
-    actions.append(Action(
-        f"<span foreground='#00ddff'>󰒲</span>  <span foreground='#FFFFFF'>{L['hibernate']}</span>",
-        hibernate_system
-    ))
+    if caps.get('hibernate', True):
+        actions.append(Action(
+            f"<span foreground='#00ddff'>󰒲</span>  <span foreground='#FFFFFF'>{L['hibernate']}</span>",
+            hibernate_system
+        ))
     
 
-    actions.append(Action(
-        f"<span foreground='#00ff00'>󰑓</span>  <span foreground='#FFFFFF'>{L['reboot']}</span>",
-        reboot_system
-    ))
+    if caps.get('reboot', True):
+        actions.append(Action(
+            f"<span foreground='#00ff00'>󰑓</span>  <span foreground='#FFFFFF'>{L['reboot']}</span>",
+            reboot_system
+        ))
     
 
-    actions.append(Action(
-        f"<span foreground='#ff0000'>󰐥</span>  <span foreground='#FFFFFF'>{L['shutdown']}</span>",
-        shutdown_system
-    ))
+    if caps.get('shutdown', True):
+        actions.append(Action(
+            f"<span foreground='#ff0000'>󰐥</span>  <span foreground='#FFFFFF'>{L['shutdown']}</span>",
+            shutdown_system
+        ))
     
 
     inp = [str(a) for a in actions]
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""rofi script-mode shim for rofi_session.ScriptSession.
+
+rofi runs `rofi_script.py <socket> [selected row]`; this forwards the call
+(ROFI_RETV, ROFI_INFO, row) to the menu and prints the rows it answers.
+"""
+import json
+import os
+import socket
+import sys
+
+
+def main():
+    request = {
+        "retv": os.environ.get("ROFI_RETV"),
+        "info": os.environ.get("ROFI_INFO"),
+        "arg": sys.argv[2] if len(sys.argv) > 2 else None
+    }
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(sys.argv[1])
+            sock.sendall(json.dumps(request).encode())
+            sock.shutdown(socket.SHUT_WR)
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk: break
+                sys.stdout.buffer.write(chunk)
+    except (OSError, IndexError):
+        # Menu gone: no rows, rofi exits
+        pass
+
+
+if __name__ == "__main__":
+    main()
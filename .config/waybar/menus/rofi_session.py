@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# encoding:utf8
+"""One rofi window for a whole menu session, through rofi's script mode.
+
+ScriptSession starts `rofi -show menu -modi menu:rofi_script.py <socket>`
+once. Every time rofi runs the script, the script connects back to the
+menu over a Unix socket and prints whatever rows the menu answers with, so
+successive select() calls (list -> sub-menu -> list) replace rows and
+prompt inside the same window, with no respawn and no flicker. Answering
+with no rows makes rofi exit. Rows carry their index as rofi `info`, so a
+selection comes back as an index, not as markup to match.
+
+Script mode is pull-based: rofi only asks for rows after a selection, so
+nothing can be pushed into a visible list. Screens that stream rows or
+need -multi-select/-password keep using rofi -dmenu.
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+
+from menu_common import RUNTIME_DIR, recv_all
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rofi_script.py")
+
+# rofi script-mode row options
+SEP = "\x1f"
+
+
+def row(label, index):
+    return f"{label}\0info{SEP}{index}"
+
+
+def header(prompt):
+    return [f"\0prompt{SEP}{prompt}", f"\0markup-rows{SEP}true", f"\0no-custom{SEP}true"]
+
+
+class ScriptSession():
+    """select() as many screens as needed, then close()."""
+
+    def __init__(self, theme, poll=0.1):
+        self.path = os.path.join(RUNTIME_DIR, f"rofi-session-{os.getpid()}.sock")
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.path)
+        self.server.listen(1)
+        self.server.settimeout(poll)
+        modi = f"menu:{sys.executable} -S {SCRIPT} {self.path}"
+        self.proc = subprocess.Popen(["rofi", "-show", "menu", "-modi", modi, "-theme", theme])
+        # rofi's script call waiting for our rows
+        self.pending = None
+
+    @property
+    def alive(self):
+        return self.proc.poll() is None
+
+    def _next_call(self):
+        """Next script call from rofi: (conn, request), or (None, None) if rofi closed."""
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except socket.timeout:
+                if not self.alive:
+                    return None, None
+                continue
+            try:
+                return conn, json.loads(recv_all(conn, 4096))
+            except ValueError:
+                conn.close()
+
+    def _answer(self, lines):
+        conn, self.pending = self.pending, None
+        try:
+            conn.sendall("".join(f"{line}\n" for line in lines).encode())
+        except OSError:
+            pass
+        conn.close()
+
+    def select(self, actions, prompt):
+        """Show `actions` under `prompt`; the chosen one, or None if rofi was closed."""
+        if self.pending is None:
+            # rofi's first call, made as soon as it starts
+            self.pending, _ = self._next_call()
+            if self.pending is None:
+                return None
+        self._answer(header(prompt) + [row(a, i) for i, a in enumerate(actions)])
+
+        self.pending, request = self._next_call()
+        if self.pending is None:
+            return None
+        try:
+            index = int(request.get("info"))
+        except (TypeError, ValueError):
+            return None
+        return actions[index] if 0 <= index < len(actions) else None
+
+    def close(self):
+        """Answer the pending call with no rows (rofi exits) and clean up."""
+        if self.pending is not None:
+            self._answer([])
+        try:
+            self.proc.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.proc.terminate()
+        self.server.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
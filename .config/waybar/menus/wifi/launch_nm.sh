@@ -1,6 +1,5 @@
 #!/bin/bash
 
-nmcli device wifi rescan > /dev/null 2>&1 &
-
-
-python3 /home/sh1fter/.config/waybar/menus/wifi/network_manager_custom.py
+# El menu vive en menu_server.py; si no esta corriendo, arranque en frio
+python3 -S /home/sh1fter/.config/waybar/menus/menu_client.py wifi ||
+    python3 /home/sh1fter/.config/waybar/menus/wifi/network_manager_custom.py
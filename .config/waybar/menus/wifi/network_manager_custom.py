@@ -1,25 +1,24 @@
 #!/usr/bin/env python3
 import pathlib
 import struct
-import configparser
 import locale
 import os
 from os.path import basename, expanduser
-import shlex
 from shutil import which
 import sys
-from time import sleep
 import uuid
 import subprocess
 import gettext
-import gi
-gi.require_version('NM', '1.0')
-from gi.repository import GLib, NM
+import json
+import threading
 
-ENV = os.environ.copy()
-ENC = locale.getpreferredencoding()
+SCRIPT_DIR = pathlib.Path(__file__).resolve().parent
+sys.path.insert(1, str(SCRIPT_DIR.parent))
+from menu_common import Action, ENC, ENV, Navigator, end_session, load_config, rofi_command, script_mode, select, write_json
+
+# libnm is loaded lazily by load_nm(); the first paint comes from AP_CACHE
+GLib = NM = None
 
-SCRIPT_DIR = pathlib.Path(__file__).parent
 LOCALE_DIR = SCRIPT_DIR / "locales"
 
 try:
@@ -40,14 +39,53 @@ try:
 except:
     _ = lambda x: x
 
-CONF = configparser.ConfigParser()
-CONF.read(expanduser("~/.config/networkmanager/config.ini"))
+CONF = load_config()
 
 CLIENT = None
-CONNS = None
+SNAPSHOT = None
 LOOP = None
+# Screen loop of this run; holds the snapshot between screens
+NAV = None
+
+WIFI_ICONS = CONF.get('dmenu', 'wifi_icons', fallback="󰤯󰤟󰤢󰤥󰤨")
+# Ensure we have enough icons, fallback to defaults if config is short
+if len(WIFI_ICONS) < 5: WIFI_ICONS = "󰤯󰤟󰤢󰤥󰤨"
 
 ROFI_THEME = expanduser("~/.config/waybar/menus/wifi/wifi.rasi")
+AP_CACHE = expanduser("~/.cache/networkmanager-dmenu/aps.json")
+
+# NetworkManager refuses a rescan right after the previous one
+SCAN_MIN_INTERVAL_MS = 10000
+SCAN_TIMEOUT_MS = 8000
+SCAN_SETTLE_MS = 500
+ACTIVATION_TIMEOUT_MS = 30000
+# Deactivate/delete replies; past this the menu gives up instead of hanging
+LOOP_TIMEOUT_MS = 10000
+
+# Minimum strength (%) for a 5/6 GHz BSSID to win over a stronger 2.4 GHz one
+HIGH_BAND_MIN = CONF.getint('dmenu', 'high_band_min_strength', fallback=45)
+
+def load_nm():
+    """Import GLib/libnm and the helpers built on them (once)."""
+    global GLib, NM, ActivationTracker, NetworkSnapshot
+    if NM is not None: return
+    import gi
+    gi.require_version('NM', '1.0')
+    from gi.repository import GLib, NM
+    from nm_activation import ActivationTracker
+    from nm_snapshot import NetworkSnapshot
+
+def load_ap_cache():
+    try:
+        with open(AP_CACHE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_ap_cache(by_ssid):
+    """Write the rendered rows so the next launch can paint them at once."""
+    rows = [{'ssid': ssid, 'label': str(a)} for ssid, a in by_ssid.items()]
+    write_json(AP_CACHE, rows)
 
 def notify(message, urgency="low"):
     if is_installed("notify-send"):
@@ -56,58 +94,19 @@ def notify(message, urgency="low"):
 def is_installed(cmd):
     return which(cmd) is not None
 
-def cli_args():
-    args = sys.argv[1:]
-    cmd = CONF.get('dmenu', 'dmenu_command', fallback=False)
-    if "-l" in args or "-p" in args:
-        for nope in ['-l', '-p'] if cmd is not False else ['-p']:
-            try:
-                nope_idx = args.index(nope)
-                del args[nope_idx]
-                del args[nope_idx]
-            except ValueError:
-                pass
-    return args
-
-def dmenu_cmd(num_lines, prompt="Redes", active_lines=None, password=False):
-    raw_cmd = CONF.get('dmenu', 'dmenu_command', fallback="rofi -dmenu")
-    command = shlex.split(raw_cmd)
-    
-    if "-dmenu" not in command:
-        command.append("-dmenu")
-    
-    if "-markup-rows" not in command:
-        command.append("-markup-rows")
-    
-    if "-p" in command:
-        idx = command.index("-p")
-        del command[idx:idx+2]
-        
-    command.extend(["-p", str(prompt)])
-    command.extend(cli_args())
+def dmenu_cmd(num_lines, prompt="Redes", active_lines=None, password=False, multi=False):
+    theme = expanduser("~/.config/waybar/menus/wifi/password.rasi") if password else ROFI_THEME
+    command = rofi_command(theme, prompt)
     
+    if multi and "-multi-select" not in command:
+        command.append("-multi-select")
     if password:
-        password_theme = expanduser("~/.config/waybar/menus/wifi/password.rasi")
-        if "-theme" in command:
-            idx = command.index("-theme")
-            command[idx+1] = password_theme
-        else:
-            command.extend(["-theme", password_theme])
         command.append("-password")
-    else:
-        # Enforce wifi theme if not password
-        if "-theme" in command:
-            idx = command.index("-theme")
-            try:
-                command[idx+1] = ROFI_THEME
-            except IndexError:
-                command.extend([ROFI_THEME])
-        else:
-            command.extend(["-theme", ROFI_THEME])
     
     return command
 
 def get_passphrase():
+    end_session()
     cmd = dmenu_cmd(0, prompt="Contraseña", password=True)
     res = subprocess.run(cmd, capture_output=True, encoding=ENC, input="").stdout.strip()
     if not res: sys.exit(0)
@@ -130,52 +129,68 @@ def ap_security(nm_ap):
     if rsn_flags & getattr(NM, '80211ApSecurityFlags').KEY_MGMT_SAE: sec_str += " WPA3"
     return sec_str.strip() if sec_str else "--"
 
-class Action():
-    def __init__(self, name, func, args=None, active=False):
-        self.name = name; self.func = func; self.is_active = active
-        self.args = args if isinstance(args, list) else ([args] if args else None)
-    def __str__(self): return self.name
-    def __call__(self): self.func(*self.args) if self.args else self.func()
-
 def process_ap(nm_ap, is_active, adapter):
     if is_active:
-        CLIENT.deactivate_connection_async(nm_ap, None, lambda *a: LOOP.quit(), None)
-        LOOP.run()
+        # `adapter` is the one holding the connection
+        CLIENT.deactivate_connection_async(adapter.get_active_connection(), None, lambda *a: LOOP.quit(), None)
+        if not run_loop():
+            notify("NetworkManager no respondió", "critical")
     else:
-        conns_cur = [i for i in CONNS if i.get_setting_wireless() is not None and conn_matches_adapter(i, adapter)]
-        con = nm_ap.filter_connections(conns_cur)
+        con = nm_ap.filter_connections(SNAPSHOT.connections_for(ssid_to_utf8(nm_ap), adapter))
         if len(con) == 1:
-            CLIENT.activate_connection_async(con[0], adapter, nm_ap.get_path(), None, lambda *a: LOOP.quit(), None)
+            tracker = track_activation(nm_ap, adapter)
+            CLIENT.activate_connection_async(con[0], adapter, nm_ap.get_path(), None, on_activate_finish, tracker)
             LOOP.run()
+            report_activation(tracker)
         else:
             password = get_passphrase() if ap_security(nm_ap) != "--" else ""
             set_new_connection(nm_ap, password, adapter)
 
-def conn_matches_adapter(conn, adapter):
-    sw = conn.get_setting_wireless()
-    if not sw: return False
-    mac = sw.get_mac_address()
-    if mac: return mac == adapter.get_permanent_hw_address()
-    sc = conn.get_setting_connection()
-    iface = sc.get_interface_name()
-    if iface: return iface == adapter.get_iface()
-    return True
+def run_loop(timeout_ms=LOOP_TIMEOUT_MS):
+    """LOOP.run() that gives up after `timeout_ms`; False if it timed out."""
+    expired = []
+    def on_timeout():
+        expired.append(True)
+        LOOP.quit()
+        return False
+    timer = GLib.timeout_add(timeout_ms, on_timeout)
+    LOOP.run()
+    if not expired:
+        GLib.source_remove(timer)
+    return not expired
 
-def on_connection_finish(client, res, data):
+def track_activation(nm_ap, adapter):
+    """Start following an activation before the request goes out."""
+    return ActivationTracker(LOOP, adapter, ssid_to_utf8(nm_ap), nm_ap.get_bssid(), ACTIVATION_TIMEOUT_MS).start()
+
+def on_activate_finish(client, res, tracker):
+    try:
+        tracker.accepted(client.activate_connection_finish(res))
+    except Exception as e:
+        print(f"Connection Error: {e}")
+        tracker.rejected(e)
+
+def on_connection_finish(client, res, tracker):
     try:
-        client.add_and_activate_connection_finish(res)
-        notify("Conexión iniciada con éxito")
+        tracker.accepted(client.add_and_activate_connection_finish(res))
     except Exception as e:
-        err_msg = str(e)
-        print(f"Connection Error: {err_msg}")
-        notify(f"Fallo en la conexión: {err_msg}", "critical")
-    LOOP.quit()
+        print(f"Connection Error: {e}")
+        tracker.rejected(e)
+
+def report_activation(tracker):
+    """Notify once the link is really up (or why it is not)."""
+    if tracker.result == "activated":
+        notify(f"Conectado a {tracker.ssid} ({tracker.steps['connected'] / 1000:.1f} s)")
+    else:
+        notify(f"Fallo en la conexión: {tracker.reason}", "critical")
 
 def set_new_connection(nm_ap, password, adapter):
 
     profile = create_wifi_profile(nm_ap, password, adapter)
-    CLIENT.add_and_activate_connection_async(profile, adapter, nm_ap.get_path(), None, on_connection_finish, None)
+    tracker = track_activation(nm_ap, adapter)
+    CLIENT.add_and_activate_connection_async(profile, adapter, nm_ap.get_path(), None, on_connection_finish, tracker)
     LOOP.run()
+    report_activation(tracker)
 
 def create_wifi_profile(nm_ap, password, adapter):
     sec = ap_security(nm_ap)
@@ -211,101 +226,313 @@ WHITE = "#FFFFFF"
 GRAY = "#7d7d7d"
 GREEN = "#00ff00"
 
+def wifi_adapters(client):
+    return [i for i in client.get_devices() if i.get_device_type() == NM.DeviceType.WIFI]
+
 def get_wifi_state():
-    client = NM.Client.new(None)
-    loop = GLib.MainLoop()
-    conns = client.get_connections()
-    
-    devices = client.get_devices()
-    wifi_devices = [i for i in devices if i.get_device_type() == NM.DeviceType.WIFI]
-    if not wifi_devices:
-        return None, None, None, None
-        
-    adapter = wifi_devices[0]
-    return client, loop, conns, adapter
+    """CLIENT and LOOP, created once per process.
+
+    NM.Client.new() is the synchronous fetch of the whole NetworkManager
+    state; menu_server.py pays it once at startup and every later menu
+    only dispatches the updates libnm queued in between.
+    """
+    global CLIENT, LOOP
+    if CLIENT is None:
+        CLIENT = NM.Client.new(None)
+        LOOP = GLib.MainLoop()
+    else:
+        context = GLib.MainContext.default()
+        while context.pending():
+            context.iteration(False)
+    return CLIENT, LOOP
+
+def build_snapshot():
+    """Re-index CLIENT (kept in sync by LOOP) without a new client."""
+    global SNAPSHOT
+    SNAPSHOT = NetworkSnapshot(CLIENT, wifi_adapters(CLIENT), HIGH_BAND_MIN)
+    return SNAPSHOT
 
 def get_selection(actions):
-    inp = [str(a) for a in actions]
-    cmd = dmenu_cmd(len(inp))
-    sel = subprocess.run(cmd, capture_output=True, input="\n".join(inp), encoding=ENC, env=ENV).stdout.strip()
-    if not sel: sys.exit(0)
-    for a in actions:
-        if str(a).strip() == sel.strip(): return a
-    sys.exit(0)
+    return select(actions, dmenu_cmd(len(actions)))
+
+def scan_age_ms(adapter):
+    """Milliseconds since the adapter's last finished scan (None if never)."""
+    last = adapter.get_last_scan()
+    if last <= 0: return None
+    return NM.utils_get_timestamp_msec() - last
+
+def request_scan(adapter):
+    """Fire a rescan without waiting, unless NetworkManager would refuse it."""
+    age = scan_age_ms(adapter)
+    if age is not None and age < SCAN_MIN_INTERVAL_MS: return
+    adapter.request_scan_async(None, lambda dev, res, data: None, None)
+
+def wait_for_scan(adapters, timeout_ms=SCAN_TIMEOUT_MS):
+    """Rescan every adapter through libnm and run LOOP until results land.
+
+    All adapters scan concurrently in one LOOP pass. Each one is done when
+    its LastScan changes, or shortly after its last access-point-added if
+    LastScan never moves; the whole wait ends at the timeout. Adapters that
+    NetworkManager would rate-limit, or that refuse the request, keep their
+    current AP list instead of stalling the others.
+    """
+    pending = {}
+    for adapter in adapters:
+        age = scan_age_ms(adapter)
+        if age is None or age >= SCAN_MIN_INTERVAL_MS:
+            pending[adapter.get_iface()] = adapter
+    if not pending:
+        return False
+
+    timers = {}
+    def stop_timer(key):
+        src = timers.pop(key, None)
+        if src: GLib.source_remove(src)
+
+    def done(iface):
+        stop_timer(iface)
+        pending.pop(iface, None)
+        if not pending:
+            stop_timer("timeout")
+            if LOOP.is_running(): LOOP.quit()
+        return False
+
+    def on_timeout():
+        timers.pop("timeout", None)
+        for iface in list(pending):
+            done(iface)
+        return False
+
+    def on_settled(iface):
+        timers.pop(iface, None)
+        return done(iface)
+
+    def on_ap_added(dev, ap):
+        # Results are arriving; give the batch a moment to complete
+        iface = dev.get_iface()
+        stop_timer(iface)
+        timers[iface] = GLib.timeout_add(SCAN_SETTLE_MS, on_settled, iface)
+
+    def on_requested(dev, res, data):
+        try:
+            dev.request_scan_finish(res)
+        except GLib.Error as e:
+            print(f"Rescan refused on {dev.get_iface()}: {e.message}")
+            done(dev.get_iface())
+
+    handlers = []
+    for adapter in pending.values():
+        handlers.append((adapter, adapter.connect("notify::last-scan", lambda dev, pspec: done(dev.get_iface()))))
+        handlers.append((adapter, adapter.connect("access-point-added", on_ap_added)))
+    timers["timeout"] = GLib.timeout_add(timeout_ms, on_timeout)
+    for adapter in list(pending.values()):
+        adapter.request_scan_async(None, on_requested, None)
+    LOOP.run()
+    for adapter, h in handlers:
+        adapter.disconnect(h)
+    return True
 
 def refresh_and_show():
-    subprocess.run(['nmcli', 'device', 'wifi', 'rescan'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     notify("Escaneando redes...")
-    sleep(2)
-    main()
+    wait_for_scan(NAV.get("snapshot").adapters.values())
+    # CLIENT already has the new APs; only the indexes are stale
+    NAV.invalidate("snapshot")
+    return show_networks
+
+def delete_connections(conns):
+    """Delete several profiles concurrently on LOOP; returns (deleted, failed)."""
+    deleted, failed = [], []
+    pending = set(range(len(conns)))
+
+    def on_deleted(conn, res, idx):
+        try:
+            conn.delete_finish(res)
+            deleted.append(conn)
+        except Exception as e:
+            print(f"Delete Error ({conn.get_id()}): {e}")
+            failed.append(conn)
+        pending.discard(idx)
+        if not pending: LOOP.quit()
+
+    for idx, conn in enumerate(conns):
+        conn.delete_async(None, on_deleted, idx)
+    if pending and not run_loop():
+        # No reply in time: count what is left as failed
+        failed.extend(conns[idx] for idx in sorted(pending))
+        pending.clear()
+    return deleted, failed
 
 def delete_connection_menu():
-    global CLIENT, LOOP, CONNS
-    saved = [i for i in CONNS if i.get_setting_wireless() is not None]
+    saved = NAV.get("snapshot").saved
     if not saved:
         notify("No hay redes guardadas")
-        main()
-        return
+        return show_networks
 
     inp = [i.get_id() for i in saved]
-    # White prompt
-    cmd = dmenu_cmd(len(inp), prompt="OLVIDAR RED")
+    to_delete = []
+    if script_mode(dmenu_cmd(len(inp), prompt="OLVIDAR RED")):
+        # -multi-select is dmenu only: in the shared window, one per visit
+        actions = [Action(c.get_id(), lambda c: c, c, keep_open=True) for c in saved]
+        selected = select(actions, dmenu_cmd(len(inp), prompt="OLVIDAR RED"), exit_on_cancel=False)
+        if selected:
+            to_delete.append(selected())
+    else:
+        # White prompt; Shift+Enter marks several rows
+        cmd = dmenu_cmd(len(inp), prompt="OLVIDAR RED", multi=True)
+        try:
+            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, encoding=ENC)
+            sel, _ = proc.communicate(input="\n".join(inp))
+        except: sel = ""
+        
+        for line in sel.splitlines():
+            conn = SNAPSHOT.saved_by_id.get(line.strip())
+            if conn and conn not in to_delete:
+                to_delete.append(conn)
+    if not to_delete:
+        return show_networks
     
-    try:
-        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, encoding=ENC)
-        sel, _ = proc.communicate(input="\n".join(inp))
-        sel = sel.strip()
-    except: sel = ""
+    deleted, failed = delete_connections(to_delete)
+    # Update the indexes in place instead of rebuilding the client
+    for conn in deleted:
+        SNAPSHOT.forget(conn)
     
-    if not sel:
-        main()
-        return
-        
-    to_delete = [i for i in saved if i.get_id() == sel]
-    if to_delete:
-        try:
-            to_delete[0].delete(None) # Sync delete
-            notify(f"Olvidada: {sel}")
-        except: 
-            notify("Error al eliminar la conexión", "critical")
-    main()
+    if len(deleted) == 1 and not failed:
+        notify(f"Olvidada: {deleted[0].get_id()}")
+    elif deleted:
+        notify(f"Olvidadas {len(deleted)} redes" + (f", {len(failed)} con error" if failed else ""))
+    if failed and not deleted:
+        notify("Error al eliminar la conexión", "critical")
+    return show_networks
 
-def main():
-    global CLIENT, LOOP, CONNS
+def load_live():
+    """Load libnm, get the client and index a snapshot. False if there is no WiFi."""
+    load_nm()
+    client, _ = get_wifi_state()
+    if not wifi_adapters(client):
+        return False
+    NAV.put("snapshot", build_snapshot())
     
-    # Ensure scan happens
-    subprocess.Popen(['nmcli', 'device', 'wifi', 'rescan'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    # Keep the next refresh fresh without blocking this one
+    for adapter in SNAPSHOT.adapters.values():
+        request_scan(adapter)
+    return True
+
+def main():
+    global NAV
+    NAV = Navigator(snapshot=build_snapshot)
+    cached = load_ap_cache()
+    # The shared script-mode window takes no streamed rows: it opens on live state
+    if cached and not script_mode(dmenu_cmd(len(cached))):
+        NAV.run(lambda: show_cached_then_live(cached))
+        return
     
-    CLIENT, LOOP, CONNS, adapter = get_wifi_state()
-    if not CLIENT:
+    if not load_live():
         notify("No se encontró adaptador WiFi", "critical")
         sys.exit(1)
-        
-    aps_all = adapter.get_access_points()
-    active_ap = adapter.get_active_access_point()
-    active_bssid = active_ap.get_bssid() if active_ap else ""
+    NAV.run(show_networks)
+
+def show_cached_then_live(cached):
+    """Paint the last known list right away while libnm loads in the background.
+
+    Networks the live snapshot finds that were not cached are appended to
+    the open rofi (it reads stdin asynchronously). The selection is always
+    resolved against live state, by SSID when the cached row is stale.
+    """
+    live = {}
+    def worker():
+        live['ok'] = load_live()
+        if live['ok']:
+            live['actions'], live['by_ssid'] = build_network_actions()
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+
+    cached_ssids = {r['ssid'] for r in cached}
+    inp = [str(a) for a in fixed_actions()] + [r['label'] for r in cached]
+    # Live rows need rofi -dmenu
+    end_session()
+    proc = subprocess.Popen(dmenu_cmd(len(inp)), stdin=subprocess.PIPE, stdout=subprocess.PIPE, encoding=ENC, env=ENV)
+    try:
+        proc.stdin.write("\n".join(inp) + "\n")
+        proc.stdin.flush()
+        while proc.poll() is None:
+            thread.join(0.05)
+            if not thread.is_alive():
+                for ssid, action in live.get('by_ssid', {}).items():
+                    if ssid not in cached_ssids:
+                        proc.stdin.write(f"{action}\n")
+                proc.stdin.flush()
+                break
+    except (BrokenPipeError, OSError):
+        pass
+    sel = proc.stdout.read().strip()
+    if not sel: sys.exit(0)
+
+    thread.join()
+    if not live.get('ok'):
+        notify("No se encontró adaptador WiFi", "critical")
+        sys.exit(1)
+    save_ap_cache(live['by_ssid'])
+
+    selected = None
+    for a in live['actions']:
+        if str(a).strip() == sel:
+            selected = a
+            break
+    if selected is None:
+        ssid = next((r['ssid'] for r in cached if r['label'].strip() == sel), None)
+        selected = live['by_ssid'].get(ssid)
+    if selected is None:
+        # Cached network is gone
+        notify("Red no disponible", "critical")
+        return show_networks
+    return selected()
+
+def fixed_actions():
+    # Fixed Options - White Text
+    forget_label = f"<span foreground='{WHITE}'>󰆴  Olvidar red guardada</span>"
+    refresh_label = f"<span foreground='{WHITE}'>󰑐  Actualizar lista</span>"
+    
+    return [
+        Action(forget_label, delete_connection_menu, keep_open=True),
+        # Not keep_open: rofi would sit frozen through the scan, since script
+        # mode cannot swap in a "searching" row; the list reopens when it ends
+        Action(refresh_label, refresh_and_show),
+        Action("     ", lambda: None)
+    ]
+
+def show_networks():
+    """Render the network list from the current snapshot; returns the next screen."""
+    NAV.get("snapshot")
+    actions, by_ssid = build_network_actions()
+    save_ap_cache(by_ssid)
     
+    if actions:
+        selected = get_selection(actions)
+        if selected:
+            return selected()
+
+def build_network_actions():
+    """Menu actions for the current SNAPSHOT, plus SSID -> network action."""
     networks = []
-    ap_names = set()
     
-    for ap in aps_all:
+    # One row per SSID; connect through its preferred BSSID and adapter
+    for name, group in SNAPSHOT.groups.items():
         try:
-            ssid = ap.get_ssid()
-            if not ssid: continue
-            name = NM.utils_ssid_to_utf8(ssid.get_data())
-            if not name or name in ap_names: continue
-            ap_names.add(name)
-            
-            strength = ap.get_strength()
+            best = SNAPSHOT.best(name)
+            ap = best['ap']
+            adapter = best['adapter']
+            strength = group.strongest['strength']
             rsn_flags = ap.get_rsn_flags()
             wpa_flags = ap.get_wpa_flags()
             # Simple security check
             is_secure = (rsn_flags != 0) or (wpa_flags != 0)
             
-            is_active = (ap.get_bssid() == active_bssid)
+            active_adapter = SNAPSHOT.active_adapter(name)
+            is_active = active_adapter is not None
             
             networks.append({
                 'ap': ap,
+                'adapter': active_adapter or adapter,
                 'name': name,
                 'strength': strength,
                 'secure': is_secure,
@@ -316,27 +543,18 @@ def main():
     # Sort: Active first, then Signal
     networks.sort(key=lambda n: (not n['active'], -n['strength']))
     
-    actions = []
-    
-    # Fixed Options - White Text
-    forget_label = f"<span foreground='{WHITE}'>󰆴  Olvidar red guardada</span>"
-    refresh_label = f"<span foreground='{WHITE}'>󰑐  Actualizar lista</span>"
-    
-    actions.append(Action(forget_label, delete_connection_menu))
-    actions.append(Action(refresh_label, refresh_and_show))
-    actions.append(Action("     ", lambda: None))
+    actions = fixed_actions()
+    by_ssid = {}
+    # With several radios, say which one each network goes through
+    multi_adapter = len(SNAPSHOT.adapters) > 1
 
     for net in networks:
         # Determine Icon based on Security/Saved
-        saved_conns = [c for c in CONNS if c.get_setting_wireless() and c.get_id() == net['name']]
-        is_saved = len(saved_conns) > 0
+        is_saved = SNAPSHOT.is_saved(net['name'])
         
         strength = net['strength']
         # Bars icon logic
-        wifi_icons = CONF.get('dmenu', 'wifi_icons', fallback="󰤯󰤟󰤢󰤥󰤨")
-        
-        # Ensure we have enough icons, fallback to defaults if config is short
-        if len(wifi_icons) < 5: wifi_icons = "󰤯󰤟󰤢󰤥󰤨"
+        wifi_icons = WIFI_ICONS
             
         if strength > 80: bars = wifi_icons[4]
         elif strength > 60: bars = wifi_icons[3]
@@ -347,25 +565,24 @@ def main():
         # Lock icon logic: Only show lock if secure AND NOT SAVED
         lock = " " if net['secure'] and not is_saved else ""
         name = net['name']
+        iface = f"  <span foreground='{GRAY}' size='small'>{net['adapter'].get_iface()}</span>" if multi_adapter else ""
         
         # Construct Label
         # Construct Label
         if net['active']:
             # Active: Green Icon + White Bold Text
-            label = f"<span foreground='{GREEN}'>{bars}</span>  <span foreground='{WHITE}' weight='bold'>{name}{lock}</span>"
+            label = f"<span foreground='{GREEN}'>{bars}</span>  <span foreground='{WHITE}' weight='bold'>{name}{lock}</span>{iface}"
         else:
             # Inactive: Gray
-            label = f"<span foreground='{GRAY}'>{bars}</span>  <span foreground='{GRAY}'>{name}{lock}</span>"
+            label = f"<span foreground='{GRAY}'>{bars}</span>  <span foreground='{GRAY}'>{name}{lock}</span>{iface}"
         
-        actions.append(Action(label, process_ap, [net['ap'], net['active'], adapter]))
+        by_ssid[name] = Action(label, process_ap, [net['ap'], net['active'], net['adapter']])
+        actions.append(by_ssid[name])
     
     if not networks:
         actions.append(Action(f"<span foreground='{GRAY}'>󰤯  Buscando redes...</span>", lambda: None))
     
-    if actions:
-        selected = get_selection(actions)
-        if selected:
-            selected()
+    return actions, by_ssid
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Follow a WiFi activation until the link is actually up.
+
+The *_async callbacks of activate/add_and_activate only mean that
+NetworkManager accepted the request. ActivationTracker keeps the GLib loop
+running after that and follows the device and NM.ActiveConnection state
+changes until the connection is activated, fails, or times out. Every step
+is timestamped relative to the click and the attempt is appended to a
+JSONL history, so slow APs and connect-time regressions show up as numbers.
+"""
+import json
+import os
+from os.path import expanduser
+import time
+
+import gi
+gi.require_version('NM', '1.0')
+from gi.repository import GLib, NM
+
+HISTORY_FILE = expanduser("~/.cache/networkmanager-dmenu/activations.jsonl")
+
+# Device states worth a timestamp, by the step they start
+DEVICE_STEPS = {
+    NM.DeviceState.PREPARE: "prepare",
+    NM.DeviceState.CONFIG: "associate",
+    NM.DeviceState.NEED_AUTH: "auth",
+    NM.DeviceState.IP_CONFIG: "dhcp",
+    NM.DeviceState.IP_CHECK: "ip_check",
+    NM.DeviceState.ACTIVATED: "connected",
+}
+
+
+def nick(enum, value):
+    try:
+        return enum(value).value_nick
+    except (ValueError, TypeError, AttributeError):
+        return str(value)
+
+
+class ActivationTracker():
+    """requested -> accepted -> activating -> activated | failed | timeout."""
+
+    def __init__(self, loop, adapter, ssid, bssid, timeout_ms=30000, history=HISTORY_FILE):
+        self.loop = loop
+        self.adapter = adapter
+        self.ssid = ssid
+        self.bssid = bssid
+        self.timeout_ms = timeout_ms
+        self.history = history
+        self.state = "requested"
+        self.result = None
+        self.reason = None
+        self.steps = {}
+        self.active = None
+        self._started = time.monotonic()
+        self._handlers = []
+        self._timer = None
+
+    def _stamp(self, step):
+        if step not in self.steps:
+            self.steps[step] = round((time.monotonic() - self._started) * 1000)
+
+    def start(self):
+        self._handlers.append((self.adapter, self.adapter.connect("state-changed", self._on_device_state)))
+        self._timer = GLib.timeout_add(self.timeout_ms, self._on_timeout)
+        return self
+
+    def accepted(self, active):
+        """Call from the *_async callback with the finish() result."""
+        self.state = "accepted"
+        self._stamp("accepted")
+        self.active = active
+        self._handlers.append((active, active.connect("state-changed", self._on_active_state)))
+        # It may have gone through before we subscribed
+        self._on_active_state(active, active.get_state(), 0)
+
+    def rejected(self, error):
+        self._finish("rejected", str(error))
+
+    def _on_device_state(self, dev, new, old, reason):
+        step = DEVICE_STEPS.get(new)
+        if step:
+            self.state = "activating"
+            self._stamp(step)
+        if new == NM.DeviceState.FAILED:
+            self._finish("failed", nick(NM.DeviceStateReason, reason))
+
+    def _on_active_state(self, active, state, reason):
+        if state == NM.ActiveConnectionState.ACTIVATED:
+            self._stamp("connected")
+            self._finish("activated")
+        elif state in (NM.ActiveConnectionState.DEACTIVATING, NM.ActiveConnectionState.DEACTIVATED):
+            self._finish("failed", nick(NM.ActiveConnectionStateReason, reason))
+
+    def _on_timeout(self):
+        self._timer = None
+        self._finish("timeout", f"no link after {self.timeout_ms} ms")
+        return False
+
+    def _finish(self, result, reason=None):
+        if self.result is not None:
+            return
+        self.result = result
+        self.reason = reason
+        self.state = result
+        self._stamp("done")
+        if self._timer:
+            GLib.source_remove(self._timer)
+            self._timer = None
+        for obj, handler in self._handlers:
+            obj.disconnect(handler)
+        self._handlers = []
+        self.record()
+        if self.loop.is_running():
+            self.loop.quit()
+
+    def record(self):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "ssid": self.ssid,
+            "bssid": self.bssid,
+            "iface": self.adapter.get_iface(),
+            "result": self.result,
+            "reason": self.reason,
+            "steps_ms": self.steps,
+            "total_ms": self.steps.get("done")
+        }
+        try:
+            os.makedirs(os.path.dirname(self.history), exist_ok=True)
+            with open(self.history, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError:
+            pass
+        return entry
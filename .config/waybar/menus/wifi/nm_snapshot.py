@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""Indexed NetworkManager state for network_manager_custom.py.
+
+A NetworkSnapshot is built once per menu refresh. It walks the saved
+connections and the access points of every WiFi adapter a single time and
+indexes them by SSID and adapter, with the BSSIDs of each SSID grouped
+together, so the list, connect and forget paths are dictionary lookups
+instead of rescans of every saved profile.
+"""
+import gi
+gi.require_version('NM', '1.0')
+from gi.repository import NM
+
+
+def ssid_of(nm_ap):
+    ssid = nm_ap.get_ssid()
+    if not ssid: return ""
+    return NM.utils_ssid_to_utf8(ssid.get_data())
+
+
+def band_of(freq):
+    """Band in GHz for a channel frequency in MHz."""
+    if freq >= 5925: return 6
+    if freq >= 4900: return 5
+    return 2.4
+
+
+class NetworkGroup():
+    """Every BSSID seen for one SSID, across all adapters."""
+
+    def __init__(self, ssid):
+        self.ssid = ssid
+        self.bssids = []
+        self.strongest = None
+
+    def add(self, ap, adapter):
+        freq = ap.get_frequency()
+        entry = {
+            'bssid': ap.get_bssid(),
+            'ap': ap,
+            'adapter': adapter,
+            'frequency': freq,
+            'band': band_of(freq),
+            'strength': ap.get_strength()
+        }
+        self.bssids.append(entry)
+        if self.strongest is None or entry['strength'] > self.strongest['strength']:
+            self.strongest = entry
+
+    def best(self, high_band_min, ifaces=()):
+        """BSSID to associate with: the strongest 5/6 GHz one if it clears
+        `high_band_min`, otherwise the strongest overall. On mesh networks
+        this avoids landing on a loud 2.4 GHz node and roaming right after.
+
+        When `ifaces` is given (adapters with a saved profile for this SSID)
+        only BSSIDs seen by those adapters are considered, so a saved network
+        is not offered through an adapter its profile is bound away from.
+        """
+        entries = [e for e in self.bssids if e['adapter'].get_iface() in ifaces] or self.bssids
+        high = [e for e in entries if e['band'] >= 5 and e['strength'] >= high_band_min]
+        if high:
+            return max(high, key=lambda e: (e['strength'], e['band']))
+        return max(entries, key=lambda e: e['strength'])
+
+
+def conn_ssid(conn):
+    """SSID a saved wireless profile points to (falls back to its id)."""
+    sw = conn.get_setting_wireless()
+    ssid = sw.get_ssid() if sw else None
+    if ssid:
+        return NM.utils_ssid_to_utf8(ssid.get_data())
+    return conn.get_id()
+
+
+class NetworkSnapshot():
+    """Saved profiles and visible APs, indexed once per refresh."""
+
+    def __init__(self, client, adapters, high_band_min=45):
+        self.client = client
+        self.high_band_min = high_band_min
+        self.adapters = {a.get_iface(): a for a in adapters}
+        self.adapter_by_hw = {a.get_permanent_hw_address().upper(): iface for iface, a in self.adapters.items() if a.get_permanent_hw_address()}
+        self.saved = [c for c in client.get_connections() if c.get_setting_wireless() is not None]
+
+        # id -> profile, SSID -> saved profiles, and per adapter SSID -> compatible profiles
+        self.saved_by_id = {}
+        self.saved_by_ssid = {}
+        self.saved_by_adapter = {iface: {} for iface in self.adapters}
+        for conn in self.saved:
+            self.saved_by_id.setdefault(conn.get_id(), conn)
+            ssid = conn_ssid(conn)
+            self.saved_by_ssid.setdefault(ssid, []).append(conn)
+            for iface in self.compatible_ifaces(conn):
+                self.saved_by_adapter[iface].setdefault(ssid, []).append(conn)
+
+        # SSID -> NetworkGroup of all its BSSIDs
+        self.groups = {}
+        # SSID -> adapter currently connected to it
+        self.active_ssids = {}
+        for iface, adapter in self.adapters.items():
+            active = adapter.get_active_access_point()
+            if active:
+                self.active_ssids[ssid_of(active)] = adapter
+            for ap in adapter.get_access_points():
+                ssid = ssid_of(ap)
+                if not ssid:
+                    continue
+                group = self.groups.get(ssid)
+                if group is None:
+                    group = self.groups[ssid] = NetworkGroup(ssid)
+                group.add(ap, adapter)
+
+    def best(self, ssid):
+        """Preferred BSSID entry for `ssid` (see NetworkGroup.best).
+
+        Saved networks prefer the adapters their profiles can use; unsaved
+        ones go by signal alone.
+        """
+        ifaces = [iface for iface, by_ssid in self.saved_by_adapter.items() if by_ssid.get(ssid)]
+        return self.groups[ssid].best(self.high_band_min, ifaces)
+
+    def compatible_ifaces(self, conn):
+        """Adapters a saved profile may use, resolved through the adapter index."""
+        sw = conn.get_setting_wireless()
+        if not sw: return []
+        mac = sw.get_mac_address()
+        if mac:
+            iface = self.adapter_by_hw.get(mac.upper())
+            return [iface] if iface else []
+        iface = conn.get_setting_connection().get_interface_name()
+        if iface: return [iface] if iface in self.adapters else []
+        return list(self.adapters)
+
+    def is_saved(self, ssid):
+        return ssid in self.saved_by_ssid
+
+    def active_adapter(self, ssid):
+        """Adapter connected to `ssid`, or None."""
+        return self.active_ssids.get(ssid)
+
+    def connections_for(self, ssid, adapter):
+        """Saved profiles for `ssid` usable on `adapter`."""
+        return self.saved_by_adapter.get(adapter.get_iface(), {}).get(ssid, [])
+
+    def forget(self, conn):
+        """Drop a deleted profile from every index."""
+        if conn in self.saved:
+            self.saved.remove(conn)
+        if self.saved_by_id.get(conn.get_id()) is conn:
+            del self.saved_by_id[conn.get_id()]
+        ssid = conn_ssid(conn)
+        for index in [self.saved_by_ssid] + list(self.saved_by_adapter.values()):
+            conns = index.get(ssid)
+            if conns and conn in conns:
+                conns.remove(conn)
+                if not conns:
+                    del index[ssid]